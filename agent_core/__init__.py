@@ -4,11 +4,32 @@ Provides:
 - api_client: OpenAI Responses API helpers for planning/execution
 - sandbox: sandboxed command execution helpers
 - orchestrator/executor/main/types: core runtime utilities
+
+Submodules are imported lazily on first attribute access (PEP 562) so that
+`import agent_core` does not pay for the openai/httpx import chain up front.
 """
 
-from . import api_client, sandbox  # re-export common entry points
+import importlib
+from contextvars import ContextVar
+from typing import Any
+
+# Runtime session id for the current workflow. Set once by the runtime (main) so
+# wrappers without a session_id parameter, e.g. executor.translate_task_to_bash,
+# can still tag requests consistently. Empty when no session is active.
+current_session: ContextVar[str] = ContextVar("current_session", default="")
+
+# Re-exported common entry points, resolved lazily
+_LAZY_SUBMODULES = frozenset({"api_client", "sandbox"})
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
+    "current_session",
     "api_client",
     "sandbox",
 ]
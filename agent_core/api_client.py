@@ -1,91 +1,286 @@
 import asyncio
+import atexit
+import inspect
 import json
 import os
+import random
+import re
 import time
-from typing import Any, Dict, List, Optional, Tuple
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
 
 import httpx
-from dotenv import load_dotenv
-from openai import APIError, OpenAI
+import structlog
+
+try:  # Optional C-accelerated JSON decoding; stdlib json is the fallback.
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+    _loads = json.loads
+
+logger = structlog.get_logger(__name__)
+
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+# Leading bullet / numbering marker on a plain-text plan line ("- ", "* ", "• ", "12. ").
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+\.)\s+")
+# Markdown code fences around model output (```json ... ```).
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.M)
+# Outermost {...} span, for JSON embedded in surrounding prose.
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    """Read a truthy boolean env flag (1/true/yes/on, case-insensitive)."""
+    return os.getenv(name, default).strip().lower() in _TRUTHY
+
+
+# .env loading is a local-development convenience. Production deployments that
+# inject real environment variables can skip the file I/O with TERMINUS_LOAD_DOTENV=false.
+if _env_flag("TERMINUS_LOAD_DOTENV", "true"):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+@dataclass(frozen=True, slots=True)
+class _Config:
+    """Immutable snapshot of the environment-driven api_client settings."""
+
+    openai_api_key: Optional[str]
+    # Fake mode allows exercising the end-to-end loop without hitting OpenAI.
+    # Enable with TERMINUS_FAKE=true, or implicitly if no OPENAI_API_KEY is present.
+    terminus_fake: bool
+    enable_planner_web_search: bool
+    enable_planner_file_search: bool
+    enable_planner_mcp: bool
+    planner_strict_json: bool
+    # Allow falling back to free-text parsing when non-strict schema parsing fails.
+    # Default to false to keep executor output well-structured.
+    executor_allow_text_fallback: bool
+    # Optional regex for single-line bash CFG guard, defaults to permissive. Planning-only for now.
+    executor_cfg_single_line: str
+    executor_api_url: str
+    safety_identifier_prefix: str
+    # Choose widely available defaults to avoid model_not_found on standard OpenAI keys.
+    planner_model: str
+    # Cache executor translations per (executor, sub_task, strict); TERMINUS_DISABLE_EXEC_CACHE=1 opts out.
+    executor_cache_enabled: bool
+
+
+@lru_cache(maxsize=1)
+def get_config() -> _Config:
+    """Read the environment exactly once and return the cached config snapshot."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    return _Config(
+        openai_api_key=api_key,
+        terminus_fake=_env_flag("TERMINUS_FAKE") or not api_key,
+        enable_planner_web_search=os.getenv("ENABLE_PLANNER_WEB_SEARCH", "false").lower()
+        == "true",
+        enable_planner_file_search=os.getenv("ENABLE_PLANNER_FILE_SEARCH", "false").lower()
+        == "true",
+        enable_planner_mcp=os.getenv("ENABLE_PLANNER_MCP", "false").lower() == "true",
+        planner_strict_json=os.getenv("PLANNER_STRICT_JSON", "true").lower() == "true",
+        executor_allow_text_fallback=os.getenv("EXECUTOR_ALLOW_TEXT_FALLBACK", "false").lower()
+        == "true",
+        executor_cfg_single_line=os.getenv("EXECUTOR_CFG_SINGLE_LINE", r"^.+$"),
+        executor_api_url=os.getenv("EXECUTOR_API_URL", "http://localhost:8002/generate"),
+        safety_identifier_prefix=os.getenv("SAFETY_IDENTIFIER_PREFIX", "terminus-"),
+        planner_model=os.getenv("PLANNER_MODEL", "gpt-5"),
+        executor_cache_enabled=not _env_flag("TERMINUS_DISABLE_EXEC_CACHE"),
+    )
 
-from agent_core.schemas import PLAN_SCHEMA
 
-load_dotenv()
+def _compile_single_line_guard(pattern: str) -> "re.Pattern[str]":
+    """Compile the EXECUTOR_CFG_SINGLE_LINE guard, falling back to the default on a bad pattern."""
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        logger.warning("executor_cfg_single_line_invalid", pattern=pattern, error=str(e))
+        return re.compile(r"^.+$")
+
+
+# Module-level aliases kept for callers that read the settings directly.
+_cfg = get_config()
+OPENAI_API_KEY = _cfg.openai_api_key
+TERMINUS_FAKE = _cfg.terminus_fake
+ENABLE_PLANNER_WEB_SEARCH = _cfg.enable_planner_web_search
+ENABLE_PLANNER_FILE_SEARCH = _cfg.enable_planner_file_search
+ENABLE_PLANNER_MCP = _cfg.enable_planner_mcp
+PLANNER_STRICT_JSON = _cfg.planner_strict_json
+EXECUTOR_ALLOW_TEXT_FALLBACK = _cfg.executor_allow_text_fallback
+EXECUTOR_CFG_SINGLE_LINE = _cfg.executor_cfg_single_line
+EXECUTOR_API_URL = _cfg.executor_api_url
+SAFETY_IDENTIFIER_PREFIX = _cfg.safety_identifier_prefix
+PLANNER_MODEL = _cfg.planner_model
+
+_CFG_RE = _compile_single_line_guard(_cfg.executor_cfg_single_line)
+
+
+def _get_client():
+    """Return the shared OpenAI client, constructing it on first use.
+
+    The openai SDK is imported lazily so importing agent_core stays cheap for
+    short-lived CLI invocations. One pooled HTTP/2 transport is shared by every
+    planner call so concurrent sessions reuse warm TLS connections instead of
+    re-handshaking. Assigning api_client.client (e.g. in tests) overrides it.
+    """
+    existing = globals().get("client")
+    if existing is not None:
+        return existing
+    from openai import OpenAI
+
+    http = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+    atexit.register(http.close)
+    created = OpenAI(api_key=get_config().openai_api_key, http_client=http)
+    globals()["client"] = created
+    return created
 
-# Environment/config
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    # Defer failure to first call, but keep message explicit for operators.
-    pass
 
-# Fake mode allows exercising the end-to-end loop without hitting OpenAI.
-# Enable with TERMINUS_FAKE=true, or implicitly if no OPENAI_API_KEY is present.
-TERMINUS_FAKE = (
-    os.getenv("TERMINUS_FAKE", "false").strip().lower() in ("1", "true", "yes", "on")
-    or not OPENAI_API_KEY
-)
+def __getattr__(name: str) -> Any:
+    # PEP 562: build the OpenAI client only when `api_client.client` is first accessed
+    if name == "client":
+        return _get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-ENABLE_PLANNER_WEB_SEARCH = os.getenv("ENABLE_PLANNER_WEB_SEARCH", "false").lower() == "true"
-ENABLE_PLANNER_FILE_SEARCH = os.getenv("ENABLE_PLANNER_FILE_SEARCH", "false").lower() == "true"
-ENABLE_PLANNER_MCP = os.getenv("ENABLE_PLANNER_MCP", "false").lower() == "true"
-PLANNER_STRICT_JSON = os.getenv("PLANNER_STRICT_JSON", "true").lower() == "true"
 
-# Allow falling back to free-text parsing when non-strict schema parsing fails.
-# Default to false to keep executor output well-structured.
-EXECUTOR_ALLOW_TEXT_FALLBACK = os.getenv("EXECUTOR_ALLOW_TEXT_FALLBACK", "false").lower() == "true"
-# Optional regex for single-line bash CFG guard, defaults to permissive. Planning-only for now.
-EXECUTOR_CFG_SINGLE_LINE = os.getenv("EXECUTOR_CFG_SINGLE_LINE", r"^.+$")
+@lru_cache(maxsize=4096)
+def _safety_tag(session_id: str) -> Dict[str, Any]:
+    """Build metadata tag used by the model for safety correlation.
 
-EXECUTOR_API_URL = os.getenv("EXECUTOR_API_URL", "http://localhost:8002/generate")
+    The tag is propagated to Responses API requests to correlate
+    model-side safety logs/metadata with a specific runtime session.
+    Cached per session id; callers must not mutate the returned dict.
+    """
+    return {"safety_identifier": f"{get_config().safety_identifier_prefix}{session_id}"}
 
-SAFETY_IDENTIFIER_PREFIX = os.getenv("SAFETY_IDENTIFIER_PREFIX", "terminus-")
+# Rate limit and server errors are worth retrying; 4xx client errors are not.
+_TRANSIENT_STATUS = frozenset({429, 500, 502, 503, 504})
 
-# Models (override via env: PLANNER_MODEL)
-# Choose widely available defaults to avoid model_not_found on standard OpenAI keys.
-PLANNER_MODEL = os.getenv("PLANNER_MODEL", "gpt-5")
+# Server-side hints consulted (in order) before falling back to computed backoff.
+_RETRY_AFTER_HEADERS = (
+    "retry-after",
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+)
 
-# OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
 
 
-def _safety_tag(session_id: str) -> Dict[str, Any]:
-    """Build metadata tag used by the model for safety correlation.
+def _parse_retry_after(value: str) -> Optional[float]:
+    """Parse a Retry-After / x-ratelimit-reset-* header value into seconds.
 
-    The tag is propagated to Responses API requests to correlate
-    model-side safety logs/metadata with a specific runtime session.
+    Accepts plain numeric seconds ("2", "0.5") and Go-style durations
+    as emitted by the OpenAI API ("1s", "6m0s", "250ms").
+    Returns None when the value cannot be interpreted.
     """
-    return {"safety_identifier": f"{SAFETY_IDENTIFIER_PREFIX}{session_id}"}
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+
+def _retry_after_from_error(e: Exception) -> Optional[float]:
+    """Extract a server-provided retry delay (seconds) from an API error, if any."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for name in _RETRY_AFTER_HEADERS:
+        raw = headers.get(name)
+        if raw is None:
+            continue
+        delay = _parse_retry_after(str(raw))
+        if delay is not None:
+            return delay
+    return None
 
-def _retry(fn, *, retries: int = 2, backoff: float = 0.75):
+
+def _retry(fn, *, retries: int = 3, base: float = 1.0, cap: float = 30.0, jitter: float = 0.5):
     """
     Retry fn() on transient API errors only.
     Do NOT retry invalid request errors (400-series schema/param issues).
+
+    Delays honor server Retry-After / x-ratelimit-reset-* hints when present,
+    otherwise use capped exponential backoff with +/- jitter so concurrent
+    sessions do not retry in lockstep.
     """
-    last = None
+
+    from openai import APIConnectionError, APIError
+
+    def _backoff(i: int) -> float:
+        delay = min(cap, base * (2**i))
+        return max(0.0, delay * (1 + random.uniform(-jitter, jitter)))
+
     for i in range(retries + 1):
         try:
             return fn()
+        except APIConnectionError:
+            # Network failure / timeout talking to the API; no server hint available
+            if i == retries:
+                raise
+            time.sleep(_backoff(i))
         except APIError as e:
-            # Avoid retrying client-side invalid requests (commonly 400)
             status = getattr(e, "status_code", None)
-            # Transient set: rate limit and server errors
-            transient = {429, 500, 502, 503, 504}
-            if status in transient:
-                last = e
-                if i == retries:
-                    raise
-                time.sleep(backoff * (2**i))
-                continue
-            # Non-transient -> re-raise immediately
-            raise
-        except Exception as e:
-            # Unknown exception; treat as transient with backoff up to retries
-            last = e
+            if status not in _TRANSIENT_STATUS:
+                # Non-transient -> re-raise immediately
+                raise
             if i == retries:
                 raise
-            time.sleep(backoff * (2**i))
-    if last:
-        raise last
+            hinted = _retry_after_from_error(e)
+            time.sleep(min(cap, hinted) if hinted is not None else _backoff(i))
+        except (ConnectionError, TimeoutError, httpx.TransportError):
+            # Low-level transport failures only; other exceptions are bugs, not retried
+            if i == retries:
+                raise
+            time.sleep(_backoff(i))
+
+
+# Keys every Responses request needs; never filtered out by the capability probe.
+_REQUIRED_RESPONSE_KWARGS = frozenset({"model", "input"})
+
+_UNEXPECTED_KWARG_RE = re.compile(r"unexpected keyword argument '([^']+)'")
+
+
+@lru_cache(maxsize=4)
+def _supported_response_kwargs(create) -> Optional[FrozenSet[str]]:
+    """Return the keyword names accepted by an SDK's responses.create.
+
+    Probed once per create callable via its signature. Returns None when the
+    signature accepts **kwargs (or cannot be inspected), meaning "pass all".
+    """
+    try:
+        params = inspect.signature(create).parameters
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        return None
+    return frozenset(params)
+
+
+def _filter_supported_kwargs(create, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy kwargs keeping only keys the SDK callable accepts (plus model/input)."""
+    allowed = _supported_response_kwargs(create)
+    if allowed is None:
+        return dict(kwargs)
+    return {k: v for k, v in kwargs.items() if k in allowed or k in _REQUIRED_RESPONSE_KWARGS}
 
 
 def _responses_create_compat(kwargs: Dict[str, Any]):
@@ -93,96 +288,95 @@ def _responses_create_compat(kwargs: Dict[str, Any]):
     Create a Responses request with compatibility fallbacks for SDKs that
     might not support newer optional fields (response_format, tools, etc.).
 
-    Strategy: progressively drop optional keys on TypeError and retry.
+    Strategy: filter kwargs to what the installed SDK's signature accepts
+    before the first call; if the SDK still rejects a keyword, drop the one
+    named in the TypeError and retry once.
     """
-    optional_drop_order = [
-        "response_format",
-        "tools",
-        "tool_choice",
-        "reasoning",
-        "text",
-        "metadata",
-        "previous_response_id",
-    ]
-
-    attempt_kwargs = dict(kwargs)
-    for _ in range(len(optional_drop_order) + 1):
-        try:
-            return client.responses.create(**attempt_kwargs)
-        except TypeError:
-            if not optional_drop_order:
-                raise
-            # Drop the next optional key that exists in the kwargs
-            dropped = False
-            for key in list(optional_drop_order):
-                if key in attempt_kwargs:
-                    attempt_kwargs.pop(key, None)
-                    optional_drop_order.remove(key)
-                    dropped = True
-                    break
-            if not dropped:
-                # Nothing left to drop -> re-raise
-                raise
+    create = _get_client().responses.create
+    clean = _filter_supported_kwargs(create, kwargs)
+    try:
+        return create(**clean)
+    except TypeError as e:
+        match = _UNEXPECTED_KWARG_RE.search(str(e))
+        offending = match.group(1) if match else None
+        if offending is None or offending in _REQUIRED_RESPONSE_KWARGS or offending not in clean:
+            raise
+        logger.warning("responses_kwarg_unsupported", kwarg=offending)
+        clean.pop(offending)
+        return create(**clean)
 
 
 def _extract_output_text(response) -> str:
     """
     Best-effort extraction of assistant text from Responses API object.
     """
-    out = []
-    for item in getattr(response, "output", []) or []:
-        content = getattr(item, "content", None)
-        if not content:
-            continue
-        for c in content:
-            if hasattr(c, "text") and c.text:
-                out.append(c.text)
-    # Some SDKs expose convenience property
-    joined = "".join(out).strip()
+    gattr = getattr
+    joined = "".join(
+        [
+            c.text
+            for item in (gattr(response, "output", None) or ())
+            for c in (gattr(item, "content", None) or ())
+            if gattr(c, "text", None)
+        ]
+    ).strip()
     if joined:
         return joined
-    # Fallback to output_text if present
-    return getattr(response, "output_text", "") or ""
+    # Fallback to output_text if present (some SDKs expose this convenience property)
+    return gattr(response, "output_text", "") or ""
 
 
 def _parse_plan_text_to_list(plan_text: str) -> List[str]:
     """
     Accepts either a JSON object string like {"plan": ["a","b"]} or plain-text bullet list.
+    JSON wrapped in ``` fences or surrounded by prose is recovered in a single
+    parse attempt; a "steps" key is accepted as an alias of "plan".
     Returns list[str] of steps.
     """
-    # Try JSON first
-    try:
-        parsed = json.loads(plan_text)
-        if isinstance(parsed, dict) and "plan" in parsed and isinstance(parsed["plan"], list):
-            # Ensure all items are strings
-            return [str(x).strip() for x in parsed["plan"] if str(x).strip()]
-        if isinstance(parsed, list):
-            return [str(x).strip() for x in parsed if str(x).strip()]
-    except Exception:
-        pass
+    text = _FENCE_RE.sub("", plan_text).strip()
+
+    # Try JSON first: the whole text if it looks like JSON, else the first {...} span
+    if text[:1] in ("{", "["):
+        candidate: Optional[str] = text
+    else:
+        match = _JSON_OBJECT_RE.search(text)
+        candidate = match.group(0) if match else None
+    if candidate is not None:
+        try:
+            parsed = _loads(candidate)
+            if isinstance(parsed, dict):
+                items = parsed.get("plan", parsed.get("steps"))
+                if isinstance(items, list):
+                    # Ensure all items are strings
+                    return [str(x).strip() for x in items if str(x).strip()]
+            elif isinstance(parsed, list):
+                return [str(x).strip() for x in parsed if str(x).strip()]
+        except Exception:
+            pass
 
     # Plain text fallback: split lines, strip bullets/digits
     steps: List[str] = []
-    for line in plan_text.splitlines():
-        raw = line.strip()
-        if not raw:
-            continue
-        # Remove common bullet/numbering prefixes
-        for prefix in ("- ", "* ", "• ", "1. ", "2. ", "3. "):
-            if raw.startswith(prefix):
-                raw = raw[len(prefix) :]
+    for line in text.splitlines():
+        raw = _BULLET_RE.sub("", line.strip(), count=1)
         if raw:
             steps.append(raw)
     return steps
 
 
+# Shared tool / allowed-tool entries with a fixed shape. They are sent as-is in
+# the request body (so plain dicts, not mappingproxy); treat them as read-only.
+_TOOL_WEB_SEARCH: Dict[str, Any] = {"type": "web_search_preview"}
+# Use object form for allowed tools entries to satisfy Responses API schema
+_ALLOW_WEB_SEARCH: Dict[str, Any] = {"type": "web_search_preview"}
+_ALLOW_FILE_SEARCH: Dict[str, Any] = {"type": "file_search"}
+
+
 def _build_planner_tools(
     enable_search: bool,
     enable_file_search: bool,
     enable_mcp: bool,
     vector_store_ids: Optional[List[str]] = None,
     mcp_servers: Optional[List[Dict[str, Any]]] = None,
-) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+) -> Tuple[Tuple[Dict[str, Any], ...], Optional[Dict[str, Any]]]:
     """Construct tool and tool_choice payloads for the planner call.
 
     Returns the pair (tools, allowed_tool_choice). Tools are optional
@@ -190,17 +384,15 @@ def _build_planner_tools(
     'tool_choice' object constraining which tools may be used.
     """
     tools: List[Dict[str, Any]] = []
-    allowed: Optional[Dict[str, Any]] = None
-    allow_names: List[Any] = []
+    allow_names: List[Dict[str, Any]] = []
 
     if enable_search:
-        tools.append({"type": "web_search_preview"})
-        # Use object form for allowed tools entries to satisfy Responses API schema
-        allow_names.append({"type": "web_search_preview"})
+        tools.append(_TOOL_WEB_SEARCH)
+        allow_names.append(_ALLOW_WEB_SEARCH)
 
     if enable_file_search:
         tools.append({"type": "file_search", "vector_store_ids": vector_store_ids or []})
-        allow_names.append({"type": "file_search"})  # Allowed tools format can be names or objects
+        allow_names.append(_ALLOW_FILE_SEARCH)
 
     if enable_mcp and mcp_servers:
         for srv in mcp_servers:
@@ -215,10 +407,74 @@ def _build_planner_tools(
             )
             allow_names.append({"type": "mcp", "server_label": srv.get("server_label")})
 
-    if allow_names:
-        allowed = {"type": "allowed_tools", "mode": "auto", "tools": allow_names}
+    if not allow_names:
+        return (), None
+    allowed = {"type": "allowed_tools", "mode": "auto", "tools": tuple(allow_names)}
+    return tuple(tools), allowed
 
-    return tools, allowed
+
+_PLANNER_SYSTEM_PROMPT = (
+    "You are an expert DevOps and systems engineer Planner.\n"
+    "Task: Decompose the user's goal into a minimal, correct step-by-step plan of simple, single-line bash commands.\n"
+    'Output STRICT JSON with a single key "plan": a JSON array of short, imperative steps.\n'
+    "Do not include explanations, only the JSON object."
+)
+
+# Static parts of every planner request; per-call fields are spliced in by run_planner.
+_PLANNER_BASE: Mapping[str, Any] = MappingProxyType(
+    {
+        "model": PLANNER_MODEL,
+        "reasoning": {"effort": "medium"},
+        "text": {"verbosity": "low"},
+    }
+)
+# Plain dicts below are sent as-is in the request body (mappingproxy is not JSON
+# serializable); treat them as read-only.
+_PLANNER_SYSTEM_MESSAGE: Dict[str, str] = {"role": "system", "content": _PLANNER_SYSTEM_PROMPT}
+
+
+@lru_cache(maxsize=1)
+def _planner_response_format() -> Dict[str, Any]:
+    """Strict JSON response_format for the planner (schemas imported on first use)."""
+    from agent_core.schemas import PLAN_SCHEMA
+
+    return {"type": "json_schema", "json_schema": PLAN_SCHEMA}
+
+
+def _planner_kwargs(
+    user_goal: str,
+    session_id: str,
+    enable_search: Optional[bool],
+    vector_store_ids: Optional[List[str]],
+    mcp_servers: Optional[List[Dict[str, Any]]],
+    previous_response_id: Optional[str],
+) -> Dict[str, Any]:
+    """Assemble Responses kwargs for one planner request from the static skeleton."""
+    cfg = get_config()
+    enable_search = cfg.enable_planner_web_search if enable_search is None else enable_search
+
+    tools, allowed = _build_planner_tools(
+        enable_search=enable_search,
+        enable_file_search=cfg.enable_planner_file_search,
+        enable_mcp=cfg.enable_planner_mcp,
+        vector_store_ids=vector_store_ids,
+        mcp_servers=mcp_servers,
+    )
+
+    kwargs: Dict[str, Any] = {
+        **_PLANNER_BASE,
+        "input": [_PLANNER_SYSTEM_MESSAGE, {"role": "user", "content": user_goal}],
+        "metadata": _safety_tag(session_id),
+    }
+    # Prefer strict structured JSON; fall back to freeform on unsupported cases
+    if cfg.planner_strict_json:
+        kwargs["response_format"] = _planner_response_format()
+    if tools:
+        kwargs["tools"] = tools
+        kwargs["tool_choice"] = allowed
+    if previous_response_id:
+        kwargs["previous_response_id"] = previous_response_id
+    return kwargs
 
 
 def run_planner(
@@ -234,133 +490,214 @@ def run_planner(
 
     Returns: list[str] of steps.
     """
-    enable_search = ENABLE_PLANNER_WEB_SEARCH if enable_search is None else enable_search
-    enable_file_search = ENABLE_PLANNER_FILE_SEARCH
-    enable_mcp = ENABLE_PLANNER_MCP
-
-    system_prompt = (
-        "You are an expert DevOps and systems engineer Planner.\n"
-        "Task: Decompose the user's goal into a minimal, correct step-by-step plan of simple, single-line bash commands.\n"
-        'Output STRICT JSON with a single key "plan": a JSON array of short, imperative steps.\n'
-        "Do not include explanations, only the JSON object."
-    )
-
-    tools, allowed = _build_planner_tools(
-        enable_search=enable_search,
-        enable_file_search=enable_file_search,
-        enable_mcp=enable_mcp,
-        vector_store_ids=vector_store_ids,
-        mcp_servers=mcp_servers,
+    # Built once per plan request (not per retry).
+    kwargs = _planner_kwargs(
+        user_goal, session_id, enable_search, vector_store_ids, mcp_servers, previous_response_id
     )
 
     def _call():
-        kwargs: Dict[str, Any] = {
-            "model": PLANNER_MODEL,
-            "input": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_goal},
-            ],
-            "reasoning": {"effort": "medium"},
-            "text": {"verbosity": "low"},
-            "metadata": _safety_tag(session_id),
-        }
-        # Prefer strict structured JSON; fall back to freeform on unsupported cases
-        if PLANNER_STRICT_JSON:
-            kwargs["response_format"] = {"type": "json_schema", "json_schema": PLAN_SCHEMA}
-        if tools:
-            kwargs["tools"] = tools
-            kwargs["tool_choice"] = allowed
-        if previous_response_id:
-            kwargs["previous_response_id"] = previous_response_id
-
         return _responses_create_compat(kwargs)
 
     resp = _retry(_call)
     text = _extract_output_text(resp).strip()
-    steps: List[str]
-    if PLANNER_STRICT_JSON:
-        try:
-            obj = json.loads(text)
-            # Strict path: expect obj to conform to PLAN_SCHEMA
-            if isinstance(obj, dict) and isinstance(obj.get("plan"), list):
-                steps = [str(x).strip() for x in obj["plan"] if str(x).strip()]
-            else:
-                steps = _parse_plan_text_to_list(text)
-        except Exception:
-            steps = _parse_plan_text_to_list(text)
-    else:
-        steps = _parse_plan_text_to_list(text)
+    # Strict JSON ({"plan": [...]} per PLAN_SCHEMA) and free-text output share one
+    # parser so the text is decoded at most once.
+    steps = _parse_plan_text_to_list(text)
     if not steps:
         # As a safety fallback, create a one-step plan.
         steps = [f"Analyze and begin: {user_goal}"]
     return steps
 
 
-def _emit_bash_tools_cfg() -> List[Dict[str, Any]]:
+class _PlanStreamParser:
+    """Incrementally extract completed steps from a streamed JSON plan.
+
+    Tracks string/escape state and bracket depth over the raw text deltas and
+    emits each string element of the top-level "plan" (or "steps") array, or
+    of a bare top-level array, as soon as its closing quote arrives.
     """
-    Returns a strict function-calling tool that forces the model to return a single-line bash command.
+
+    def __init__(self) -> None:
+        self._chars: List[str] = []
+        self._in_str = False
+        self._escape = False
+        self._depth = 0
+        self._plan_depth = -1
+        self._last_str: Optional[str] = None
+        self._expect_plan = False
+
+    def feed(self, chunk: str) -> List[str]:
+        steps: List[str] = []
+        for ch in chunk:
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+                    value = str(_loads('"' + "".join(self._chars) + '"'))
+                    if self._depth == self._plan_depth:
+                        if value.strip():
+                            steps.append(value.strip())
+                    else:
+                        self._last_str = value
+                    continue
+                self._chars.append(ch)
+            elif ch == '"':
+                self._in_str = True
+                self._chars = []
+            elif ch == ":":
+                self._expect_plan = self._depth == 1 and self._last_str in ("plan", "steps")
+            elif ch in "{[":
+                if ch == "[" and self._plan_depth < 0 and (self._expect_plan or self._depth == 0):
+                    self._plan_depth = self._depth + 1
+                self._depth += 1
+                self._expect_plan = False
+            elif ch in "}]":
+                if self._depth == self._plan_depth:
+                    # Plan array closed; ignore any later arrays
+                    self._plan_depth = -2
+                self._depth -= 1
+            elif not ch.isspace():
+                self._expect_plan = False
+        return steps
+
+
+def embed_text(text: str, model: str = "text-embedding-3-small") -> List[float]:
+    """Return the embedding vector for text (used by the plan cache)."""
+
+    def _call():
+        return _get_client().embeddings.create(model=model, input=text)
+
+    resp = _retry(_call)
+    return list(resp.data[0].embedding)
+
+
+def stream_planner(
+    user_goal: str,
+    session_id: str,
+    enable_search: Optional[bool] = None,
+    vector_store_ids: Optional[List[str]] = None,
+    mcp_servers: Optional[List[Dict[str, Any]]] = None,
+    previous_response_id: Optional[str] = None,
+) -> Iterator[str]:
     """
-    return [
-        {
-            "type": "function",
-            "name": "emit_bash",
-            "description": "Return a single-line executable bash command for the given sub-task. No comments.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "command": {
-                        "type": "string",
-                        "description": "Single-line bash command. Must not contain newlines.",
-                    }
-                },
-                "required": ["command"],
-                "additionalProperties": False,
+    Streaming variant of run_planner(): yields plan steps as the model emits them.
+
+    Callers can start executing step 1 while later steps are still being
+    generated. Falls back to the blocking run_planner() when the SDK has no
+    streaming support or the stream fails before any step was produced.
+    Free-text (non-JSON) output is parsed once the stream completes.
+    """
+    stream = getattr(_get_client().responses, "stream", None)
+    if stream is None:
+        yield from run_planner(
+            user_goal,
+            session_id,
+            enable_search,
+            vector_store_ids,
+            mcp_servers,
+            previous_response_id,
+        )
+        return
+
+    kwargs = _planner_kwargs(
+        user_goal, session_id, enable_search, vector_store_ids, mcp_servers, previous_response_id
+    )
+    parser = _PlanStreamParser()
+    text_parts: List[str] = []
+    emitted = 0
+    try:
+        with stream(**_filter_supported_kwargs(stream, kwargs)) as events:
+            for event in events:
+                if getattr(event, "type", None) != "response.output_text.delta":
+                    continue
+                delta = getattr(event, "delta", "") or ""
+                text_parts.append(delta)
+                for step in parser.feed(delta):
+                    emitted += 1
+                    yield step
+    except Exception as e:
+        if emitted:
+            raise
+        logger.warning("planner_stream_failed", session_id=session_id, error=str(e))
+        yield from run_planner(
+            user_goal,
+            session_id,
+            enable_search,
+            vector_store_ids,
+            mcp_servers,
+            previous_response_id,
+        )
+        return
+
+    if not emitted:
+        steps = _parse_plan_text_to_list("".join(text_parts).strip())
+        yield from steps or [f"Analyze and begin: {user_goal}"]
+
+
+# Strict function-calling tool forcing a single-line bash command. Built once;
+# treat as read-only since the same object is handed to every request.
+_EMIT_BASH_TOOLS: Tuple[Dict[str, Any], ...] = (
+    {
+        "type": "function",
+        "name": "emit_bash",
+        "description": "Return a single-line executable bash command for the given sub-task. No comments.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "command": {
+                    "type": "string",
+                    "description": "Single-line bash command. Must not contain newlines.",
+                }
             },
-            "strict": True,
-        }
-    ]
+            "required": ["command"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    },
+)
+
+
+def _emit_bash_tools_cfg() -> Tuple[Dict[str, Any], ...]:
+    """
+    Returns a strict function-calling tool that forces the model to return a single-line bash command.
+    """
+    return _EMIT_BASH_TOOLS
+
+
+def _parse_emit_bash_args(args: Any) -> Optional[str]:
+    """Decode emit_bash arguments (JSON string or dict) into the command string."""
+    if isinstance(args, str):
+        try:
+            obj = _loads(args)
+            return str(obj.get("command", "")).strip()
+        except Exception:
+            return None
+    if isinstance(args, dict):
+        return str(args.get("command", "")).strip()
+    return None
 
 
 def _extract_function_call_command(resp) -> Optional[str]:
     """
     Extract the 'command' argument from a strict function call to emit_bash.
-    Prefers top-level output items with type == 'function_call' and name == 'emit_bash'.
-    Falls back to scanning nested content entries if needed.
+    Accepts top-level output items with type == 'function_call' and name == 'emit_bash',
+    as well as function call envelopes nested in an item's content, in one pass.
     """
-    output = getattr(resp, "output", []) or []
-
-    # Preferred: top-level function_call items
-    for item in output:
-        if (
-            getattr(item, "type", None) == "function_call"
-            and getattr(item, "name", None) == "emit_bash"
-        ):
-            args = getattr(item, "arguments", None) or getattr(item, "args", None)
-            if isinstance(args, str):
-                try:
-                    obj = json.loads(args)
-                    return str(obj.get("command", "")).strip()
-                except Exception:
-                    pass
-            elif isinstance(args, dict):
-                return str(args.get("command", "")).strip()
-
-    # Fallback: nested content entries that may contain a function call envelope
-    for item in output:
-        content = getattr(item, "content", None)
-        if not content:
-            continue
-        for c in content:
-            if getattr(c, "name", None) == "emit_bash":
-                args = getattr(c, "arguments", None) or getattr(c, "args", None)
-                if isinstance(args, str):
-                    try:
-                        obj = json.loads(args)
-                        return str(obj.get("command", "")).strip()
-                    except Exception:
-                        pass
-                elif isinstance(args, dict):
-                    return str(args.get("command", "")).strip()
+    for item in getattr(resp, "output", None) or ():
+        if getattr(item, "type", None) == "function_call":
+            candidates = (item,)
+        else:
+            candidates = getattr(item, "content", None) or ()
+        for cand in candidates:
+            if getattr(cand, "name", None) != "emit_bash":
+                continue
+            args = getattr(cand, "arguments", None) or getattr(cand, "args", None)
+            command = _parse_emit_bash_args(args)
+            if command is not None:
+                return command
 
     return None
 
@@ -372,23 +709,83 @@ def _to_single_line(cmd: str) -> str:
     whitespace so downstream sandbox checks can rely on a stable,
     single-line representation.
     """
-    single = " ".join(cmd.replace("\t", " ").replace("\r", " ").replace("\n", " ").split())
-    return single.strip()
+    # str.split() with no separator already breaks on \t, \r and \n, so this is
+    # one C-level pass with no intermediate copies.
+    return " ".join(cmd.split())
+
+
+def _validate_single_line(cmd: str) -> bool:
+    """Check a normalized command against the EXECUTOR_CFG_SINGLE_LINE guard."""
+    return _CFG_RE.match(cmd) is not None
+
+
+# Upper bound on in-flight executor requests issued by run_executor_batch.
+EXECUTOR_BATCH_CONCURRENCY = 16
+
+# LRU of translated commands keyed by (executor url, sub_task, strict_mode). The
+# session id is deliberately not part of the key: it only tags requests for safety
+# correlation and does not influence the translated command.
+EXECUTOR_CACHE_MAXSIZE = 512
+_EXECUTOR_CACHE: "OrderedDict[Tuple[str, str, bool], str]" = OrderedDict()
+
+
+# Static part of every executor API request body.
+_EXECUTOR_BASE: Mapping[str, Any] = MappingProxyType({"max_new_tokens": 256})
+
+
+def _executor_request_body(sub_task: str) -> Dict[str, Any]:
+    """Build the JSON body sent to the local executor API for one sub-task."""
+    return {**_EXECUTOR_BASE, "prompt": sub_task}
+
+
+# One pooled keep-alive client per event loop for executor calls. httpx async
+# connections belong to the loop that opened them, so the pool cannot be global.
+_EXECUTOR_HTTP: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _executor_http() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    http = _EXECUTOR_HTTP.get(loop)
+    if http is None or http.is_closed:
+        http = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=64, max_keepalive_connections=20, keepalive_expiry=60.0
+            ),
+        )
+        _EXECUTOR_HTTP[loop] = http
+    return http
+
+
+async def aclose_executor_http() -> None:
+    """Close the executor pool of the running loop (call on server shutdown)."""
+    http = _EXECUTOR_HTTP.pop(asyncio.get_running_loop(), None)
+    if http is not None:
+        await http.aclose()
+
 
 async def run_executor_async(
     sub_task: str,
     session_id: str,
     strict_mode: bool = False,
     previous_response_id: Optional[str] = None,
+    *,
+    http_client: Optional[httpx.AsyncClient] = None,
 ) -> str:
     """
     Translate a sub-task into a single-line executable bash command
     by calling the local executor API asynchronously.
 
+    Pass http_client to use a specific connection pool (see run_executor_batch);
+    otherwise the running loop's shared keep-alive pool is used.
+
     Returns: single-line bash command as str.
     """
+    cfg = get_config()
     # FAKE MODE: deterministic mappings from sub_task to one-line bash.
-    if TERMINUS_FAKE:
+    if cfg.terminus_fake:
         task = (sub_task or "").strip().lower()
         if "print hello" in task:
             return "echo hello"
@@ -402,17 +799,22 @@ async def run_executor_async(
         # Default noop
         return "echo noop"
 
-    async def _call_local_executor_async():
+    cache_key = (cfg.executor_api_url, (sub_task or "").strip(), strict_mode)
+    if cfg.executor_cache_enabled:
+        cached = _EXECUTOR_CACHE.get(cache_key)
+        if cached is not None:
+            _EXECUTOR_CACHE.move_to_end(cache_key)
+            logger.debug("executor_cache_hit", session_id=session_id)
+            return cached
+
+    async def _call_local_executor_async(http: httpx.AsyncClient):
         try:
             # Replace 0.0.0.0 with localhost for client requests
-            api_url = EXECUTOR_API_URL.replace("0.0.0.0", "localhost")
-            async with httpx.AsyncClient(timeout=30.0) as http_client:
-                response = await http_client.post(
-                    api_url, json={"prompt": sub_task, "max_new_tokens": 256}
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("command", "")
+            api_url = cfg.executor_api_url.replace("0.0.0.0", "localhost")
+            response = await http.post(api_url, json=_executor_request_body(sub_task))
+            response.raise_for_status()
+            data = _loads(response.content)
+            return data.get("command", "")
         except httpx.RequestError as e:
             # Re-raise as a generic exception to be caught by the retry handler
             raise Exception(f"Local executor request failed: {e}") from e
@@ -422,8 +824,41 @@ async def run_executor_async(
     # The _retry function is synchronous, so we can't use it directly.
     # For now, we'll just call the async function directly without retries.
     # A proper solution would be to implement an async retry mechanism.
-    command = await _call_local_executor_async()
-    return _to_single_line(command or "")
+    command = await _call_local_executor_async(http_client or _executor_http())
+    command = _to_single_line(command or "")
+    if not _validate_single_line(command):
+        # Advisory for now: surface the mismatch but let the sandbox sanitizer decide.
+        logger.warning("executor_command_cfg_mismatch", session_id=session_id, command=command)
+    elif cfg.executor_cache_enabled and command:
+        _EXECUTOR_CACHE[cache_key] = command
+        if len(_EXECUTOR_CACHE) > EXECUTOR_CACHE_MAXSIZE:
+            _EXECUTOR_CACHE.popitem(last=False)
+    return command
+
+
+async def run_executor_batch(sub_tasks: List[str], session_id: str) -> List[str]:
+    """
+    Translate several sub-tasks concurrently over one shared connection pool.
+
+    Requests overlap (bounded by EXECUTOR_BATCH_CONCURRENCY) so a plan of N
+    steps costs roughly one executor round-trip instead of N.
+
+    Returns: commands in the same order as sub_tasks.
+    """
+    semaphore = asyncio.Semaphore(EXECUTOR_BATCH_CONCURRENCY)
+    limits = httpx.Limits(
+        max_connections=EXECUTOR_BATCH_CONCURRENCY,
+        max_keepalive_connections=EXECUTOR_BATCH_CONCURRENCY,
+    )
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as http_client:
+
+        async def _one(sub_task: str) -> str:
+            async with semaphore:
+                return await run_executor_async(
+                    sub_task, session_id, strict_mode=True, http_client=http_client
+                )
+
+        return list(await asyncio.gather(*(_one(t) for t in sub_tasks)))
 
 
 def run_executor(
@@ -438,6 +873,12 @@ def run_executor(
 
     Returns: single-line bash command as str.
     """
-    return asyncio.run(
-        run_executor_async(sub_task, session_id, strict_mode, previous_response_id)
-    )
+
+    async def _once() -> str:
+        # The loop lives for this call only, so its client must too
+        async with httpx.AsyncClient(timeout=30.0) as http:
+            return await run_executor_async(
+                sub_task, session_id, strict_mode, previous_response_id, http_client=http
+            )
+
+    return asyncio.run(_once())
@@ -1,15 +1,32 @@
+import asyncio
+import threading
 import uuid
+from typing import List
 
-from agent_core import api_client
+from agent_core import api_client, current_session
+
+# Per-thread ephemeral session id, generated lazily and reused across calls
+_tls = threading.local()
 
 
 def _ephemeral_session_id() -> str:
-    """Generate a short, unique session id for safety tagging.
+    """Return a short session id for safety tagging, stable per thread.
 
     Used when the public wrapper is called without a runtime-provided
-    session identifier to ensure safety_identifier propagation.
+    session identifier to ensure safety_identifier propagation. The id is
+    generated once per thread so consecutive sub-tasks share correlation;
+    call reset_session() to rotate it.
     """
-    return uuid.uuid4().hex[:12]
+    sid = getattr(_tls, "sid", None)
+    if sid is None:
+        sid = uuid.uuid4().hex[:12]
+        _tls.sid = sid
+    return sid
+
+
+def reset_session() -> None:
+    """Discard the current thread's ephemeral session id; the next call mints a new one."""
+    _tls.sid = None
 
 
 def translate_task_to_bash(sub_task: str) -> str:
@@ -20,11 +37,11 @@ def translate_task_to_bash(sub_task: str) -> str:
 
     Notes:
     - This wrapper adheres to the specified signature (no session_id param).
-    - For safety_identifier tagging, we generate an ephemeral session id here.
-      When available, prefer calling api_client.run_executor directly with a
-      stable session id from the runtime to correlate logs and safety metadata.
+    - For safety_identifier tagging, the runtime session from
+      agent_core.current_session is used when set; otherwise a per-thread
+      ephemeral session id.
     """
-    session_id = _ephemeral_session_id()
+    session_id = current_session.get() or _ephemeral_session_id()
     return api_client.run_executor(
         sub_task=sub_task,
         session_id=session_id,
@@ -32,4 +49,15 @@ def translate_task_to_bash(sub_task: str) -> str:
     )
 
 
-__all__ = ["translate_task_to_bash"]
+def translate_tasks_to_bash(sub_tasks: List[str]) -> List[str]:
+    """
+    Batch variant of translate_task_to_bash().
+
+    Translates all sub-tasks concurrently under one session id (the runtime
+    session when set, else an ephemeral one) and returns the commands in input order.
+    """
+    session_id = current_session.get() or _ephemeral_session_id()
+    return asyncio.run(api_client.run_executor_batch(sub_tasks, session_id))
+
+
+__all__ = ["reset_session", "translate_task_to_bash", "translate_tasks_to_bash"]
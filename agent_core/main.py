@@ -1,12 +1,23 @@
 import asyncio
+import atexit
+import contextvars
+import functools
 import json
+import logging
 import os
 
 # System checks
 import pwd
+import queue
+import re
+import sys
+import threading
 import time
 import uuid
-from typing import Any, Dict, List
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
 
 import socketio
 import structlog
@@ -14,32 +25,91 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, Response, WebSocket
 
 # Metrics
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    GC_COLLECTOR,
+    PLATFORM_COLLECTOR,
+    PROCESS_COLLECTOR,
+    REGISTRY,
+    Counter,
+    Histogram,
+    generate_latest,
+)
 from pydantic import ValidationError
 
-from agent_core import api_client, sandbox
+from agent_core import api_client, current_session, plan_cache, sandbox
 
 # Internal modules
 from agent_core.types import (
-    ErrorDetectedPayload,
+    ErrorDetectedEvent,
     ExecuteGoalPayload,
-    PlanGeneratedPayload,
     RePlanningPayload,
-    StepExecutingPayload,
-    StepResultPayload,
+    StepResultEvent,
     WorkflowCompletePayload,
 )
 
+try:  # Optional C-accelerated JSON encoding; stdlib json is the fallback.
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        """Serialize to compact JSON text."""
+        return orjson.dumps(obj).decode()
+
+    class _OrjsonModule:
+        """json-module shim so python-socketio/engineio encode packets with orjson.
+
+        The libraries call dumps(data, separators=...) and loads(text); orjson is
+        always compact, so keyword arguments are only honored on the stdlib
+        fallback used for values orjson cannot encode (e.g. non-str dict keys).
+        """
+
+        @staticmethod
+        def dumps(obj: Any, **kwargs: Any) -> str:
+            try:
+                return orjson.dumps(obj).decode()
+            except TypeError:
+                return json.dumps(obj, **kwargs)
+
+        @staticmethod
+        def loads(s: Any, **kwargs: Any) -> Any:
+            return orjson.loads(s)
+
+    _SOCKETIO_JSON: Any = _OrjsonModule
+
+    def _log_serializer(obj: Any, default: Any = None, **kwargs: Any) -> str:
+        """structlog JSONRenderer serializer; `default` reprs unknown objects."""
+        return orjson.dumps(obj, default=default).decode()
+
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+
+    def _dumps(obj: Any) -> str:
+        """Serialize to compact JSON text."""
+        return json.dumps(obj, separators=(",", ":"))
+
+    _SOCKETIO_JSON = None  # library default
+    _log_serializer = json.dumps
+
+
 # ---- Utility coercion helpers (silence typing issues for sandbox result dicts) ----
 
 
 def _safe_int(value: object, default: int = -1) -> int:
     """Best-effort conversion to int; returns default on failure."""
+    if type(value) is int:  # fast path: sandbox results already carry ints
+        return value
+    return _safe_int_slow(value, default)
+
+
+def _safe_int_slow(value: object, default: int) -> int:
+    if isinstance(value, int):  # bool and int subclasses
+        return int(value)
+    if isinstance(value, str):
+        # Validate up front so malformed strings never raise; isdecimal() (unlike
+        # isdigit()) only admits characters int() accepts.
+        text = value.strip()
+        digits = text[1:] if text[:1] == "-" else text
+        return int(text) if digits.isdecimal() else default
     try:
-        if isinstance(value, (int,)):
-            return int(value)
-        if isinstance(value, str):
-            return int(value) if value.strip().lstrip("-").isdigit() else default
         # Accept objects that implement __int__
         return int(value)  # type: ignore
     except Exception:
@@ -48,9 +118,11 @@ def _safe_int(value: object, default: int = -1) -> int:
 
 def _safe_str(value: object, default: str = "") -> str:
     """Best-effort conversion to str; returns default on failure or None."""
+    if type(value) is str:  # fast path
+        return value
+    if value is None:
+        return default
     try:
-        if value is None:
-            return default
         return str(value)
     except Exception:
         return default
@@ -58,7 +130,70 @@ def _safe_str(value: object, default: str = "") -> str:
 
 # ---- Configuration & Logging ----
 
-load_dotenv()
+# Mirror api_client: .env is a dev convenience, opt out with TERMINUS_LOAD_DOTENV=false
+if os.getenv("TERMINUS_LOAD_DOTENV", "true").strip().lower() in ("1", "true", "yes", "on"):
+    load_dotenv()
+
+# Structlog config (simple JSON). Calls below LOG_LEVEL are dropped by the
+# filtering bound logger before any processor runs.
+_LOG_LEVEL = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").strip().upper())
+if not isinstance(_LOG_LEVEL, int):
+    _LOG_LEVEL = logging.INFO
+
+
+class _QueuedLineLogger:
+    """structlog logger that hands rendered lines to a background writer thread.
+
+    Keeps stdout writes (and any pipe back-pressure) off the event loop thread.
+    """
+
+    def __init__(self, lines: "queue.SimpleQueue[Optional[str]]"):
+        self._lines = lines
+
+    def msg(self, message: str) -> None:
+        self._lines.put(message)
+
+    log = debug = info = warn = warning = error = err = critical = exception = fatal = msg
+
+
+def _start_log_writer() -> "queue.SimpleQueue[Optional[str]]":
+    lines: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+
+    def _write():
+        while (line := lines.get()) is not None:
+            sys.stdout.write(line + "\n")
+            if lines.empty():
+                sys.stdout.flush()
+        sys.stdout.flush()
+
+    writer = threading.Thread(target=_write, name="log-writer", daemon=True)
+    writer.start()
+
+    def _drain():
+        lines.put(None)
+        writer.join(timeout=2.0)
+
+    atexit.register(_drain)
+    return lines
+
+
+# LOG_ASYNC=false writes log lines synchronously from the calling thread instead
+if os.getenv("LOG_ASYNC", "true").strip().lower() in ("1", "true", "yes", "on"):
+    _LOG_LINES = _start_log_writer()
+    _logger_factory: Any = lambda *args: _QueuedLineLogger(_LOG_LINES)  # noqa: E731
+else:
+    _logger_factory = structlog.PrintLoggerFactory()
+
+structlog.configure(
+    processors=[
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.add_log_level,
+        structlog.processors.JSONRenderer(serializer=_log_serializer),
+    ],
+    wrapper_class=structlog.make_filtering_bound_logger(_LOG_LEVEL),
+    logger_factory=_logger_factory,
+    cache_logger_on_first_use=True,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -80,17 +215,17 @@ except KeyError:
     # Not fatal to start, but warn
     logger.warning("sandbox_user_missing", user=SANDBOX_USER)
 
-# Structlog config (simple JSON)
-structlog.configure(
-    processors=[
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.add_log_level,
-        structlog.processors.JSONRenderer(),
-    ]
-)
-
 # ---- Metrics ----
 
+# Process/platform/GC collectors are re-read on every scrape and nothing here
+# consumes them; keep them only when asked for with METRICS_PROCESS=1.
+if os.getenv("METRICS_PROCESS", "false").strip().lower() not in ("1", "true", "yes", "on"):
+    for _collector in (PROCESS_COLLECTOR, PLATFORM_COLLECTOR, GC_COLLECTOR):
+        try:
+            REGISTRY.unregister(_collector)
+        except KeyError:  # already unregistered (module re-import)
+            pass
+
 REQUESTS_EXECUTE_GOAL = Counter(
     "engine_execute_goal_requests_total",
     "Total execute_goal requests received",
@@ -103,20 +238,58 @@ STEPS_FAILED = Counter(
     "engine_steps_failed_total",
     "Total sub-steps failed (non-zero exit or executor error)",
 )
+
+
+class BatchedCounter:
+    """Accumulates increments locally and applies them to a Counter in bulk.
+
+    prometheus_client takes a lock on every inc(); this takes it once per batch.
+    Counts stay exact: pending increments are flushed before every /metrics
+    render and at shutdown. Only used from the event loop thread.
+    """
+
+    def __init__(self, base: Counter, batch: int):
+        self._base = base
+        self._batch = max(1, batch)
+        self._pending = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self._pending += amount
+        if self._pending >= self._batch:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self._base.inc(self._pending)
+            self._pending = 0
+
+
+# METRICS_SAMPLE_RATE=p applies hot-path counter increments in batches of ~1/p
+METRICS_SAMPLE_RATE = min(1.0, max(1e-6, float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))))
+_COUNTER_BATCH = round(1.0 / METRICS_SAMPLE_RATE)
+_EXECUTE_GOAL_REQUESTS = BatchedCounter(REQUESTS_EXECUTE_GOAL, _COUNTER_BATCH)
+_STEPS_EXECUTED = BatchedCounter(STEPS_EXECUTED, _COUNTER_BATCH)
+_STEPS_FAILED = BatchedCounter(STEPS_FAILED, _COUNTER_BATCH)
+_BATCHED_COUNTERS = (_EXECUTE_GOAL_REQUESTS, _STEPS_EXECUTED, _STEPS_FAILED)
+# Log-spaced (x4) latency buckets: few bins, even relative resolution from
+# sub-second responses up to the minute-long planner tail.
 PLANNER_LATENCY = Histogram(
     "engine_planner_seconds",
     "Planner call latency (seconds)",
-    buckets=(0.2, 0.5, 1, 2, 5, 10, 30, 60),
+    unit="seconds",
+    buckets=(0.25, 1.0, 4.0, 16.0, 64.0, float("inf")),
 )
 EXECUTOR_LATENCY = Histogram(
     "engine_executor_seconds",
     "Executor call latency (seconds)",
-    buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5),
+    unit="seconds",
+    buckets=(0.1, 0.4, 1.6, 6.4, float("inf")),
 )
 SANDBOX_LATENCY = Histogram(
     "engine_sandbox_seconds",
     "Sandbox execution latency (seconds)",
-    buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30),
+    unit="seconds",
+    buckets=(0.1, 1.0, 10.0, 60.0, float("inf")),
 )
 
 # ---- Error Taxonomy ----
@@ -127,10 +300,38 @@ def _cat(msg: str, category: str) -> str:
     return f"[{category}] {msg}"
 
 
+def _error_event(msg: str, category: str, failed_step: str) -> ErrorDetectedEvent:
+    """error_detected payload (shape of ErrorDetectedPayload) as a plain dict."""
+    return {"error": _cat(msg, category), "failed_step": failed_step}
+
+
 # ---- Server (FastAPI + Socket.IO) ----
 
+
+def _socketio_serializer() -> str:
+    """Packet serializer from SOCKETIO_SERIALIZER ("default" JSON or "msgpack").
+
+    msgpack needs the msgpack package here and a matching parser on clients
+    (socket.io-msgpack-parser / AsyncClient(serializer="msgpack")).
+    """
+    name = os.getenv("SOCKETIO_SERIALIZER", "default").strip().lower()
+    if name != "msgpack":
+        return "default"
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        logger.warning("socketio_msgpack_unavailable", fallback="default")
+        return "default"
+    return "msgpack"
+
+
 # Socket.IO server (ASGI)
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="*",
+    serializer=_socketio_serializer(),
+    json=_SOCKETIO_JSON,
+)
 app = FastAPI()
 sio_app = socketio.ASGIApp(sio, other_asgi_app=app)
 
@@ -147,10 +348,32 @@ async def readyz():
     return {"status": status, "issues": _RUNTIME_ISSUES}
 
 
+# Rendered exposition is reused for METRICS_TTL seconds so concurrent or
+# back-to-back scrapers share one registry walk. The walk itself runs in a worker
+# thread so a large registry never stalls the event loop.
+_RENDER_TTL = float(os.getenv("METRICS_TTL", "0.5"))
+_last_render: Tuple[float, bytes] = (float("-inf"), b"")
+_render_lock = asyncio.Lock()
+
+
 @app.get("/metrics")
 async def metrics():
-    data = generate_latest()  # type: ignore
-    return Response(content=data, media_type=CONTENT_TYPE_LATEST)
+    global _last_render
+    if time.monotonic() - _last_render[0] > _RENDER_TTL:
+        async with _render_lock:
+            # Re-check: a scrape we waited on may have refreshed it already
+            if time.monotonic() - _last_render[0] > _RENDER_TTL:
+                for counter in _BATCHED_COUNTERS:
+                    counter.flush()
+                rendered = await asyncio.to_thread(generate_latest, REGISTRY)
+                _last_render = (time.monotonic(), rendered)
+    data = _last_render[1]
+    # Uncompressed on purpose: payload is small and gzip costs more CPU than it saves
+    return Response(
+        content=data,
+        media_type=CONTENT_TYPE_LATEST,
+        headers={"Content-Encoding": "identity"},
+    )
 
 
 # Optional raw WebSocket endpoint for diagnostics
@@ -158,12 +381,12 @@ async def metrics():
 async def websocket_endpoint(ws: WebSocket):
     await ws.accept()
     await ws.send_text(
-        json.dumps({"type": "status", "payload": {"message": "raw websocket online"}})
+        _dumps({"type": "status", "payload": {"message": "raw websocket online"}})
     )
     try:
         while True:
             data = await ws.receive_text()
-            await ws.send_text(json.dumps({"type": "echo", "payload": {"message": data}}))
+            await ws.send_text(_dumps({"type": "echo", "payload": {"message": data}}))
     except Exception:
         await ws.close()
 
@@ -175,25 +398,307 @@ def new_session_id() -> str:
     return uuid.uuid4().hex[:12]
 
 
-# Simple per-socket rate limiter in-memory
-_last_exec_ts: Dict[str, float] = {}
+# Simple per-socket rate limiter in-memory (time.monotonic() stamps). Entries are
+# kept oldest-first and capped, so eviction pops from the front in O(1).
+RATE_LIMIT_MAX_SOCKETS = 10_000
+_last_exec_ts: "OrderedDict[str, float]" = OrderedDict()
 MIN_EXECUTE_GOAL_INTERVAL_SEC = float(os.getenv("EXECUTE_GOAL_MIN_INTERVAL_SEC", "2.0"))
 
+# Periodic eviction of per-socket state left behind by missed disconnects
+SESSION_SWEEP_INTERVAL_SEC = 300.0
+_RATE_LIMIT_ENTRY_TTL_SEC = MIN_EXECUTE_GOAL_INTERVAL_SEC * 100
+
 # Max payload size guard for goal
 MAX_GOAL_LEN = int(os.getenv("MAX_GOAL_LEN", "2000"))
+# Forward sandbox stdout/stderr as step_output events while a step runs; the
+# step_result then carries only the tail of each stream.
+_STREAM_OUTPUT_ENV = os.getenv("SANDBOX_STREAM_OUTPUT", "false").strip().lower()
+SANDBOX_STREAM_OUTPUT = _STREAM_OUTPUT_ENV in ("1", "true", "yes", "on")
+# Translate step i+1 with the executor while step i runs in the sandbox
+_SPECULATIVE_ENV = os.getenv("SPECULATIVE_EXEC", "false").strip().lower()
+SPECULATIVE_EXEC = _SPECULATIVE_ENV in ("1", "true", "yes", "on")
+# Debug aid: run every execute_goal payload through ExecuteGoalPayload, not just
+# the ones the fast path cannot accept
+_STRICT_ENV = os.getenv("STRICT_VALIDATION", "false").strip().lower()
+STRICT_VALIDATION = _STRICT_ENV in ("1", "true", "yes", "on")
+# Coalesce events emitted back-to-back for one socket into a single "batch" packet.
+# Off by default so clients that only know the per-event contract keep working.
+_BATCH_ENV = os.getenv("SOCKETIO_BATCH_EVENTS", "false").strip().lower()
+SOCKETIO_BATCH_EVENTS = _BATCH_ENV in ("1", "true", "yes", "on")
+# Longest a batched event waits for company before it is sent on its own
+SOCKETIO_BATCH_WINDOW_SEC = float(os.getenv("SOCKETIO_BATCH_WINDOW_MS", "5")) / 1000.0
+
+# Explicit event-loop yield cadence in the step loop
+_YIELD_EVERY_STEPS = 8
 
 # Track running tasks per socket for cooperative cancellation
-_RUNNING_TASKS: Dict[str, asyncio.Task] = {}
+# Weak values: execute_goal awaits its task, which keeps it alive while it runs;
+# once it finishes the entry is popped by a done callback or reclaimed with it.
+_RUNNING_TASKS: "weakref.WeakValueDictionary[str, asyncio.Task]" = weakref.WeakValueDictionary()
+
+# Plan steps whose first word is one of these are executed verbatim, skipping the
+# executor model. Matched as whole words so prose like "categorize ..." is not
+# mistaken for `cat`.
+_DIRECT_PREFIXES = (
+    "if",
+    "while",
+    "curl",
+    "sudo",
+    "rm",
+    "wget",
+    "apt",
+    "apt-get",
+    "dnf",
+    "yum",
+    "brew",
+    "winget",
+    "choco",
+    "bash",
+    "echo",
+    "cat",
+    "ls",
+    "cd",
+    "mkdir",
+    "touch",
+)
+_DIRECT_RE = re.compile(
+    r"^(?:%s)\b" % "|".join(map(re.escape, sorted(_DIRECT_PREFIXES, key=len, reverse=True)))
+)
+
+# Executor output rejected outright: GUI terminals or Windows-only shells
+_FORBIDDEN_RE = re.compile(
+    r"^(?:open -a terminal|cmd(?:\.exe)?\b|start |powershell)",  # open -a: macOS GUI app
+    re.IGNORECASE,
+)
+
+# Execution history passed to the planner on re-plan: most recent entries only,
+# truncated to HISTORY_MAX_CHARS characters of JSON
+HISTORY_MAX_ENTRIES = 16
+HISTORY_MAX_CHARS = 4000
+
+
+def _history_snippet(history_json_parts: Iterable[str]) -> str:
+    """Join pre-serialized history entries into a bounded JSON array string.
+
+    Stops at the first entry that reaches the budget, so the work per re-plan is
+    bounded by HISTORY_MAX_CHARS rather than by the size of the history.
+    """
+    pieces = ["["]
+    size = 1
+    for part in history_json_parts:
+        if size > 1:
+            pieces.append(",")
+            size += 1
+        pieces.append(part)
+        size += len(part)
+        if size >= HISTORY_MAX_CHARS:
+            return "".join(pieces)[:HISTORY_MAX_CHARS]
+    pieces.append("]")
+    return "".join(pieces)[:HISTORY_MAX_CHARS]
+
+# Planner calls block on network I/O; run them on a dedicated bounded pool so they
+# neither starve nor are starved by other default-executor work.
+PLANNER_WORKERS = int(os.getenv("PLANNER_WORKERS", "8"))
+_PLANNER_EXECUTOR = ThreadPoolExecutor(max_workers=PLANNER_WORKERS, thread_name_prefix="planner")
+
+
+async def _call_blocking(fn, /, **kwargs: Any) -> Any:
+    """Run a blocking (LLM) call on the bounded planner pool, preserving contextvars."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_PLANNER_EXECUTOR, functools.partial(ctx.run, fn, **kwargs))
+
+
+def _log_plan_cache_store(fut: "Future[None]") -> None:
+    if fut.exception() is not None:
+        logger.warning("plan_cache_store_failed", error=str(fut.exception()))
+
+
+async def _translate_step(step: str, session_id: str) -> Tuple[str, float]:
+    """Executor call for one plan step; returns (command, latency seconds)."""
+    t0 = time.perf_counter()
+    try:
+        command = await api_client.run_executor_async(sub_task=step, session_id=session_id)
+    finally:
+        latency = time.perf_counter() - t0
+        EXECUTOR_LATENCY.observe(latency)
+    return command, latency
+
+
+def _drop_task(task: Optional[asyncio.Task]) -> None:
+    """Cancel a task nobody will await, without leaving an unretrieved exception."""
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+async def _run_planner(user_goal: str, session_id: str) -> List[str]:
+    return await _call_blocking(api_client.run_planner, user_goal=user_goal, session_id=session_id)
+
+
+# Opt-in: execute plan steps as the planner streams them instead of waiting for
+# the full plan. Steps are announced with plan_step_added; plan_generated still
+# follows once the plan is complete.
+_STREAMING_ENV = os.getenv("PLANNER_STREAMING", "false").strip().lower()
+PLANNER_STREAMING = _STREAMING_ENV in ("1", "true", "yes", "on")
+
+
+async def _stream_plan(goal: str, session_id: str, sid: str, steps: "asyncio.Queue[Any]"):
+    """Pump api_client.stream_planner (on the planner pool) into `steps`.
+
+    Every step is queued and announced as it is parsed. When the stream ends the
+    full plan is emitted as plan_generated and None is queued; a planner failure
+    queues the exception instead.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    stop = threading.Event()
+    arrived: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    def produce():
+        item: Any = None
+        try:
+            for step in api_client.stream_planner(goal, session_id):
+                if stop.is_set():  # consumer gone (re-plan/cancel); close the stream
+                    return
+                loop.call_soon_threadsafe(arrived.put_nowait, step)
+        except Exception as e:
+            item = e
+        loop.call_soon_threadsafe(arrived.put_nowait, item)
+
+    _PLANNER_EXECUTOR.submit(ctx.run, produce)
+    plan: List[str] = []
+    t0 = time.perf_counter()
+    try:
+        while isinstance(item := await arrived.get(), str):
+            plan.append(item)
+            steps.put_nowait(item)
+            # Plain dict matching PlanStepAddedPayload (item is already a str)
+            await emit_json("plan_step_added", {"index": len(plan) - 1, "step": item}, sid)
+    finally:
+        stop.set()
+    PLANNER_LATENCY.observe(time.perf_counter() - t0)
+    if item is None:
+        await emit_json("plan_generated", {"plan": plan}, sid)
+    steps.put_nowait(item)
+
 
 # ---- Event helpers ----
 
 
+class EmitBatcher:
+    """Per-socket event buffer flushed as one "batch" packet.
+
+    Events queue until flush() is awaited at a step boundary or until the batch
+    window elapses, whichever comes first, so a slow step still reports progress.
+    A flush holding a single event sends it as that plain event.
+    """
+
+    def __init__(self, window_sec: float):
+        self._window = window_sec
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flushes: set = set()  # strong refs to timer-driven flush tasks
+
+    def add(self, event_type: str, payload: Dict[str, Any], sid: str) -> None:
+        frames = self._pending.get(sid)
+        if frames is None:
+            frames = self._pending[sid] = []
+            loop = asyncio.get_running_loop()
+            self._timers[sid] = loop.call_later(self._window, self._flush_later, sid)
+        frames.append({"type": event_type, "payload": payload})
+
+    def _flush_later(self, sid: str) -> None:
+        self._timers.pop(sid, None)
+        task = asyncio.ensure_future(self.flush(sid))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self, sid: str) -> None:
+        timer = self._timers.pop(sid, None)
+        if timer is not None:
+            timer.cancel()
+        frames = self._pending.pop(sid, None)
+        if not frames:
+            return
+        if len(frames) == 1:
+            frame = frames[0]
+            await sio.emit(frame["type"], frame, to=sid)
+            return
+        await sio.emit("batch", {"type": "batch", "payload": {"events": frames}}, to=sid)
+
+    def discard(self, sid: str) -> None:
+        """Drop anything still queued for a socket that went away."""
+        timer = self._timers.pop(sid, None)
+        if timer is not None:
+            timer.cancel()
+        self._pending.pop(sid, None)
+
+
+_EMITS = EmitBatcher(SOCKETIO_BATCH_WINDOW_SEC) if SOCKETIO_BATCH_EVENTS else None
+
+
 async def emit_json(event_type: str, payload: Dict[str, Any], sid: str):
+    if _EMITS is not None:
+        _EMITS.add(event_type, payload, sid)
+        return
     await sio.emit(event_type, {"type": event_type, "payload": payload}, to=sid)
 
 
+async def flush_events(sid: str):
+    """Send events still queued for sid (no-op unless SOCKETIO_BATCH_EVENTS is on)."""
+    if _EMITS is not None:
+        await _EMITS.flush(sid)
+
+
+async def emit_batch(events: List[Tuple[str, Dict[str, Any]]], sid: str):
+    """Emit consecutive events; as one "batch" packet when SOCKETIO_BATCH_EVENTS is on.
+
+    The batch payload is {"events": [{"type", "payload"}, ...]} in emit order and
+    also carries anything queued earlier in the same step.
+    """
+    for event_type, payload in events:
+        await emit_json(event_type, payload, sid)
+    await flush_events(sid)
+
+
+# Fixed-content events, built once at import and emitted as-is (read-only)
+_CONNECTED_EVENT: Dict[str, Any] = {"type": "status", "payload": {"message": "connected"}}
+_REPLAN_EVENT: Dict[str, Any] = {
+    "type": "re_planning",
+    "payload": RePlanningPayload().model_dump(),
+}
+_WORKFLOW_OK_EVENT: Dict[str, Any] = {
+    "type": "workflow_complete",
+    "payload": WorkflowCompletePayload(status="success").model_dump(),
+}
+
+
 # ---- Lifecycle ----
 
+_SWEEP_TASK: Optional[asyncio.Task] = None
+
+
+def _sweep_stale_sessions(now: float) -> int:
+    """Drop expired rate-limit stamps; returns entries removed."""
+    cutoff = now - _RATE_LIMIT_ENTRY_TTL_SEC
+    removed = 0
+    while _last_exec_ts and next(iter(_last_exec_ts.values())) < cutoff:
+        _last_exec_ts.popitem(last=False)
+        removed += 1
+    return removed
+
+
+async def _session_sweeper():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SEC)
+        removed = _sweep_stale_sessions(time.monotonic())
+        if removed:
+            logger.info("session_sweep", removed=removed)
+
 
 @app.on_event("startup")
 async def _on_startup():
@@ -204,27 +709,30 @@ async def _on_startup():
         )
         if os.path.exists(startup_script_path):
             logger.info("Running sandbox setup script", script_path=startup_script_path)
-            # Use asyncio.create_subprocess_shell for non-blocking execution
-            process = await asyncio.create_subprocess_shell(
-                f"bash {startup_script_path}",
+            # Exec bash directly (no /bin/sh layer) and stream merged output to
+            # the log as it arrives instead of buffering it until exit.
+            process = await asyncio.create_subprocess_exec(
+                "bash",
+                startup_script_path,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
             )
-            stdout, stderr = await process.communicate()
-            if process.returncode != 0:
-                logger.error(
-                    "Sandbox setup failed",
-                    returncode=process.returncode,
-                    stdout=stdout.decode(),
-                    stderr=stderr.decode(),
-                )
+            assert process.stdout is not None
+            async for line in process.stdout:
+                logger.info("sandbox_setup", line=line.rstrip().decode(errors="replace"))
+            returncode = await process.wait()
+            if returncode != 0:
+                logger.error("Sandbox setup failed", returncode=returncode)
             else:
-                logger.info("Sandbox setup complete", stdout=stdout.decode())
+                logger.info("Sandbox setup complete")
         else:
             logger.warning("Sandbox setup script not found", path=startup_script_path)
     except Exception as e:
         logger.error("Error during sandbox setup", error=str(e))
 
+    global _SWEEP_TASK
+    _SWEEP_TASK = asyncio.create_task(_session_sweeper(), name="session_sweeper")
+
     logger.info("engine_startup", ready=_RUNTIME_READY, issues=_RUNTIME_ISSUES)
 
 
@@ -232,11 +740,18 @@ async def _on_startup():
 async def _on_shutdown():
     # Graceful shutdown: cancel all running workflows
     logger.info("engine_shutdown_begin", running=len(_RUNNING_TASKS))
+    if _SWEEP_TASK is not None:
+        _SWEEP_TASK.cancel()
     for sid, task in list(_RUNNING_TASKS.items()):
         if not task.done():
             task.cancel()
     # Give tasks a moment to cancel
     await asyncio.sleep(0.1)
+    _PLANNER_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    await api_client.aclose_executor_http()
+    await sandbox.aclose_shell_workers()
+    for counter in _BATCHED_COUNTERS:
+        counter.flush()
     logger.info("engine_shutdown_end")
 
 
@@ -246,12 +761,21 @@ async def _on_shutdown():
 @sio.event
 async def connect(sid, environ):
     logger.info("socket_connected", sid=sid)
-    await emit_json("status", {"message": "connected"}, sid)
+    await sio.emit("status", _CONNECTED_EVENT, to=sid)
+
+
+def _forget_task(sid: str, task: asyncio.Task) -> None:
+    # Only drop the entry if a newer workflow has not replaced it meanwhile
+    if _RUNNING_TASKS.get(sid) is task:
+        _RUNNING_TASKS.pop(sid, None)
 
 
 @sio.event
 async def disconnect(sid):
     logger.info("socket_disconnected", sid=sid)
+    _last_exec_ts.pop(sid, None)
+    if _EMITS is not None:
+        _EMITS.discard(sid)
     # Cancel any running workflow tied to this socket
     task = _RUNNING_TASKS.pop(sid, None)
     if task and not task.done():
@@ -261,7 +785,7 @@ async def disconnect(sid):
 # Contract: {"type": "execute_goal", "payload": {"goal": "..."}}
 @sio.event
 async def execute_goal(sid, data):
-    REQUESTS_EXECUTE_GOAL.inc()
+    _EXECUTE_GOAL_REQUESTS.inc()
 
     # Prevent concurrent workflows on same socket: cancel previous if running
     prev = _RUNNING_TASKS.get(sid)
@@ -270,146 +794,168 @@ async def execute_goal(sid, data):
         await asyncio.sleep(0)  # yield to allow cancellation
 
     # Rate limit per socket
-    now = time.time()
-    last = _last_exec_ts.get(sid, 0.0)
+    now = time.monotonic()
+    last = _last_exec_ts.get(sid, float("-inf"))
     if now - last < MIN_EXECUTE_GOAL_INTERVAL_SEC:
         msg = f"Rate limit: wait {MIN_EXECUTE_GOAL_INTERVAL_SEC - (now - last):.1f}s"
         logger.warning("rate_limited", sid=sid, min_interval=MIN_EXECUTE_GOAL_INTERVAL_SEC)
         await emit_json(
             "error_detected",
-            ErrorDetectedPayload(
-                error=_cat(msg, "rate_limit"), failed_step="rate_limit"
-            ).model_dump(),
+            _error_event(msg, "rate_limit", "rate_limit"),
             sid,
         )
         return
     _last_exec_ts[sid] = now
+    _last_exec_ts.move_to_end(sid)
+    if len(_last_exec_ts) > RATE_LIMIT_MAX_SOCKETS:
+        _last_exec_ts.popitem(last=False)
 
     # Validate shape
     try:
         if not isinstance(data, dict):
             raise ValueError("Invalid data, expected object with payload")
-        payload = data.get("payload", {})
-        req = ExecuteGoalPayload(**payload)
+        payload = data.get("payload") or {}
+        raw_goal = payload.get("goal") if isinstance(payload, dict) else None
+        if type(raw_goal) is not str or STRICT_VALIDATION:
+            # Only malformed payloads pay for pydantic (and get its error message);
+            # a str goal is exactly what ExecuteGoalPayload would accept.
+            raw_goal = ExecuteGoalPayload.model_validate(payload).goal
     except (ValidationError, ValueError) as e:
         logger.warning("invalid_execute_goal_payload", sid=sid, error=str(e))
         await emit_json(
             "error_detected",
-            ErrorDetectedPayload(
-                error=_cat(f"Invalid execute_goal payload: {e}", "validation"),
-                failed_step="validate",
-            ).model_dump(),
+            _error_event(f"Invalid execute_goal payload: {e}", "validation", "validate"),
             sid,
         )
         return
 
-    goal = (req.goal or "").strip()
+    goal = (raw_goal or "").strip()
     if not goal:
         await emit_json(
             "error_detected",
-            ErrorDetectedPayload(
-                error=_cat("Goal must be a non-empty string", "validation"),
-                failed_step="validate",
-            ).model_dump(),
+            _error_event("Goal must be a non-empty string", "validation", "validate"),
             sid,
         )
         return
-    if len(goal) > MAX_GOAL_LEN:
+    # MAX_GOAL_LEN is a UTF-8 byte cap. For ASCII (isascii() is O(1)) the
+    # character count equals the byte count, so only non-ASCII goals are encoded.
+    if len(goal) > MAX_GOAL_LEN or (
+        not goal.isascii() and len(goal.encode("utf-8")) > MAX_GOAL_LEN
+    ):
         await emit_json(
             "error_detected",
-            ErrorDetectedPayload(
-                error=_cat(f"Goal too long (>{MAX_GOAL_LEN} chars)", "validation"),
-                failed_step="validate",
-            ).model_dump(),
+            _error_event(f"Goal too long (>{MAX_GOAL_LEN} bytes)", "validation", "validate"),
             sid,
         )
         return
 
     async def _workflow():
         session_id = new_session_id()
+        # Scoped to this workflow task's context; propagates to executor wrappers
+        current_session.set(session_id)
         logger.info("execute_goal_received", sid=sid, session_id=session_id, goal_len=len(goal))
+        # Streaming mode: steps arrive on plan_steps (None = plan complete)
+        plan_task: Optional[asyncio.Task] = None
+        plan_steps: Optional["asyncio.Queue[Any]"] = None
+        # SPECULATIVE_EXEC: (index, step, executor task) for the next plan step
+        speculative: Optional[Tuple[int, str, asyncio.Task]] = None
+        # Step counters are kept locally and flushed to Prometheus once per workflow
+        steps_executed = steps_failed = 0
         try:
-            # Planning
-            try:
-                with PLANNER_LATENCY.time():
-                    plan_list: List[str] = await asyncio.to_thread(
-                        api_client.run_planner,
-                        user_goal=goal,
-                        session_id=session_id,
+            # Planning (a plan cached from an earlier successful run skips the planner)
+            plan_list: List[str] = []
+            cache = plan_cache.get_plan_cache()
+            cached_plan: Optional[List[str]] = None
+            goal_embedding = None
+            if cache is not None:
+                try:
+                    cached_plan, goal_embedding = await _call_blocking(cache.lookup, goal=goal)
+                except Exception as e:
+                    logger.warning("plan_cache_lookup_failed", sid=sid, error=str(e))
+            if cached_plan is not None:
+                plan_list = cached_plan
+                await emit_json("plan_generated", {"plan": plan_list}, sid)
+            elif PLANNER_STREAMING:
+                plan_steps = asyncio.Queue()
+                plan_task = asyncio.create_task(_stream_plan(goal, session_id, sid, plan_steps))
+            else:
+                t0 = time.perf_counter()
+                try:
+                    plan_list = await _run_planner(goal, session_id)
+                except Exception as e:
+                    PLANNER_LATENCY.observe(time.perf_counter() - t0)
+                    logger.error("planner_error", sid=sid, session_id=session_id, error=str(e))
+                    await emit_json(
+                        "error_detected",
+                        _error_event(f"Planner error: {e}", "planner", "planning"),
+                        sid,
                     )
-            except Exception as e:
-                logger.error("planner_error", sid=sid, session_id=session_id, error=str(e))
-                await emit_json(
-                    "error_detected",
-                    ErrorDetectedPayload(
-                        error=_cat(f"Planner error: {e}", "planner"),
-                        failed_step="planning",
-                    ).model_dump(),
-                    sid,
-                )
-                return
+                    return
 
-            # Announce plan
-            await emit_json(
-                "plan_generated",
-                PlanGeneratedPayload(plan=plan_list).model_dump(),
-                sid,
-            )
+                PLANNER_LATENCY.observe(time.perf_counter() - t0)
+
+                # Announce plan
+                await emit_json("plan_generated", {"plan": plan_list}, sid)
+
+            # Execute steps sequentially with re-planning on error.
+            # History is kept as already-serialized compact JSON entries (latest
+            # HISTORY_MAX_ENTRIES only) so re-planning never re-encodes old steps.
+            history_json_parts: Deque[str] = deque(maxlen=HISTORY_MAX_ENTRIES)
+
+            on_output: Optional[sandbox.OutputCallback] = None
+            if SANDBOX_STREAM_OUTPUT:
+
+                async def on_output(stream: str, data: str) -> None:
+                    # Plain dict matching StepOutputPayload
+                    await emit_json("step_output", {"stream": stream, "data": data}, sid)
 
-            # Execute steps sequentially with re-planning on error
-            history: List[Dict[str, Any]] = []
             step_index = 0
+            steps_run = 0
+            replanned = False
+
+            while True:
+                if step_index >= len(plan_list):
+                    if plan_steps is None:
+                        break
+                    # Plan still streaming: wait for the next step
+                    item = await plan_steps.get()
+                    if item is None:
+                        plan_steps = None
+                    elif isinstance(item, Exception):
+                        logger.error(
+                            "planner_error", sid=sid, session_id=session_id, error=str(item)
+                        )
+                        await emit_json(
+                            "error_detected",
+                            _error_event(f"Planner error: {item}", "planner", "planning"),
+                            sid,
+                        )
+                        return
+                    else:
+                        plan_list.append(item)
+                    continue
 
-            while step_index < len(plan_list):
-                # Yield control periodically for cancellation responsiveness
-                await asyncio.sleep(0)
+                # Each step already awaits the sandbox (a real suspension point where
+                # cancellation lands), so an explicit yield is only needed now and then.
+                steps_run += 1
+                if steps_run % _YIELD_EVERY_STEPS == 0:
+                    await asyncio.sleep(0)
 
                 step = plan_list[step_index]
 
                 command = step
-                is_direct_command = any(
-                    step.startswith(pfx)
-                    for pfx in (
-                        "if",
-                        "while",
-                        "curl",
-                        "sudo",
-                        "rm",
-                        "wget",
-                        "apt",
-                        "apt-get",
-                        "dnf",
-                        "yum",
-                        "brew",
-                        "winget",
-                        "choco",
-                        "bash",
-                        "echo",
-                        "cat",
-                        "ls",
-                        "cd",
-                        "mkdir",
-                        "touch",
-                    )
-                )
+                is_direct_command = _DIRECT_RE.match(step) is not None
 
                 if not is_direct_command:
                     try:
-                        start_exec = time.time()
-                        with EXECUTOR_LATENCY.time():
-                            command = await api_client.run_executor_async(
-                                sub_task=step,
-                                session_id=session_id,
-                            )
+                        if speculative is not None and speculative[:2] == (step_index, step):
+                            # Translated while the previous step was running
+                            command, exec_latency = await speculative[2]
+                            speculative = None
+                        else:
+                            command, exec_latency = await _translate_step(step, session_id)
                         # Short-circuit steps that try to open GUI terminals or use Windows-only shells
-                        forbidden_prefixes = (
-                            "open -a Terminal",  # macOS GUI app
-                            "cmd ",
-                            "cmd.exe",
-                            "start ",
-                            "powershell",
-                        )
-                        if any(command.lower().startswith(pfx) for pfx in forbidden_prefixes):
+                        if _FORBIDDEN_RE.match(command):
                             raise RuntimeError(f"forbidden command: {command}")
                         logger.info(
                             "executor_command",
@@ -418,7 +964,7 @@ async def execute_goal(sid, data):
                             step_index=step_index,
                             step=step,
                             command=command,
-                            latency=time.time() - start_exec,
+                            latency=exec_latency,
                         )
                     except Exception as e:
                         logger.error(
@@ -428,33 +974,36 @@ async def execute_goal(sid, data):
                             step=step,
                             error=str(e),
                         )
-                        await emit_json(
-                            "error_detected",
-                            ErrorDetectedPayload(
-                                error=_cat(f"Executor error: {e}", "executor"),
-                                failed_step=step,
-                            ).model_dump(),
+                        # Report the failure and announce re-planning
+                        await emit_batch(
+                            [
+                                (
+                                    "error_detected",
+                                    _error_event(f"Executor error: {e}", "executor", step),
+                                ),
+                                ("re_planning", _REPLAN_EVENT["payload"]),
+                            ],
                             sid,
                         )
-                        # Attempt re-planning
-                        await emit_json("re_planning", RePlanningPayload().model_dump(), sid)
+                        replanned = True
+                        if plan_task is not None:  # drop the rest of a streaming plan
+                            plan_task.cancel()
+                            plan_task = plan_steps = None
+                        if speculative is not None:
+                            _drop_task(speculative[2])
+                            speculative = None
                         try:
                             revised_goal = (
                                 f"Revise plan after failure.\nOriginal goal: {goal}\nFailed step: {step}\n"
-                                f"Error: {e}\nHistory: {json.dumps(history)[:4000]}"
+                                f"Error: {e}\nHistory: {_history_snippet(history_json_parts)}"
                             )
-                            with PLANNER_LATENCY.time():
-                                plan_list = await asyncio.to_thread(
-                                    api_client.run_planner,
-                                    user_goal=revised_goal,
-                                    session_id=session_id,
-                                )
+                            t0 = time.perf_counter()
+                            try:
+                                plan_list = await _run_planner(revised_goal, session_id)
+                            finally:
+                                PLANNER_LATENCY.observe(time.perf_counter() - t0)
                             step_index = 0
-                            await emit_json(
-                                "plan_generated",
-                                PlanGeneratedPayload(plan=plan_list).model_dump(),
-                                sid,
-                            )
+                            await emit_json("plan_generated", {"plan": plan_list}, sid)
                             continue
                         except Exception as e2:
                             logger.error(
@@ -465,92 +1014,107 @@ async def execute_goal(sid, data):
                             )
                             await emit_json(
                                 "error_detected",
-                                ErrorDetectedPayload(
-                                    error=_cat(f"Re-planning failed: {e2}", "planner"),
-                                    failed_step=step,
-                                ).model_dump(),
+                                _error_event(f"Re-planning failed: {e2}", "planner", step),
                                 sid,
                             )
                             return
-                # Notify UI of step executing + command
-                await emit_json(
-                    "step_executing",
-                    StepExecutingPayload(step=step, command=command).model_dump(),
-                    sid,
-                )
+                # Notify UI of step executing + command. Per-step payloads are built
+                # as plain dicts matching StepExecutingPayload/StepResultPayload: the
+                # fields are already str/int, so pydantic validation would be a no-op.
+                await emit_json("step_executing", {"step": step, "command": command}, sid)
+
+                # Overlap the next step's executor call with this step's sandbox run
+                if SPECULATIVE_EXEC and step_index + 1 < len(plan_list):
+                    _drop_task(speculative[2] if speculative is not None else None)
+                    next_step = plan_list[step_index + 1]
+                    speculative = None
+                    if _DIRECT_RE.match(next_step) is None:
+                        speculative = (
+                            step_index + 1,
+                            next_step,
+                            asyncio.create_task(_translate_step(next_step, session_id)),
+                        )
 
                 # Execute in sandbox
-                STEPS_EXECUTED.inc()
-                start_sbx = time.time()
-                with SANDBOX_LATENCY.time():
-                    result = await sandbox.execute_command_async(command)
-
-                # Emit results
-                await emit_json(
-                    "step_result",
-                    StepResultPayload(
-                        stdout=_safe_str(result.get("stdout", "")),
-                        stderr=_safe_str(result.get("stderr", "")),
-                        exit_code=_safe_int(result.get("exit_code", -1)),
-                    ).model_dump(),
-                    sid,
-                )
-
-                # Record history
-                history.append(
-                    {
-                        "step": step,
-                        "command": command,
-                        "stdout": _safe_str(result.get("stdout", "")),
-                        "stderr": _safe_str(result.get("stderr", "")),
-                        "exit_code": _safe_int(result.get("exit_code", -1)),
-                        "sandbox_latency": time.time() - start_sbx,
-                    }
+                steps_executed += 1
+                t0 = time.perf_counter()
+                result = await sandbox.execute_command_async(command, on_output=on_output)
+                sandbox_latency = time.perf_counter() - t0
+                SANDBOX_LATENCY.observe(sandbox_latency)
+
+                # Normalize result fields once per step
+                stdout = _safe_str(result.get("stdout", ""))
+                stderr = _safe_str(result.get("stderr", ""))
+                exit_code = _safe_int(result.get("exit_code", -1))
+
+                # Emit results (a failing step's result goes out with its error below)
+                step_result: StepResultEvent = {
+                    "stdout": stdout,
+                    "stderr": stderr,
+                    "exit_code": exit_code,
+                }
+                if exit_code == 0:
+                    await emit_json("step_result", step_result, sid)
+                    await flush_events(sid)
+
+                # Record history (serialized once, compact JSON). Outputs longer than
+                # the whole snippet budget could never be shown, so cap them here.
+                history_json_parts.append(
+                    _dumps(
+                        {
+                            "step": step,
+                            "command": command,
+                            "stdout": stdout[:HISTORY_MAX_CHARS],
+                            "stderr": stderr[:HISTORY_MAX_CHARS],
+                            "exit_code": exit_code,
+                            "sandbox_latency": sandbox_latency,
+                        }
+                    )
                 )
 
                 # Error -> re-plan
-                if _safe_int(result.get("exit_code", -1)) != 0:
-                    STEPS_FAILED.inc()
+                if exit_code != 0:
+                    steps_failed += 1
                     logger.warning(
                         "step_failed",
                         sid=sid,
                         session_id=session_id,
                         step_index=step_index,
                         step=step,
-                        exit_code=result.get("exit_code"),
+                        exit_code=exit_code,
                     )
-                    await emit_json(
-                        "error_detected",
-                        ErrorDetectedPayload(
-                            error=_cat(
-                                _safe_str(result.get("stderr", ""))[:2000] or "unknown error",
-                                "sandbox",
+                    await emit_batch(
+                        [
+                            ("step_result", step_result),
+                            (
+                                "error_detected",
+                                _error_event(stderr[:2000] or "unknown error", "sandbox", step),
                             ),
-                            failed_step=step,
-                        ).model_dump(),
+                            ("re_planning", _REPLAN_EVENT["payload"]),
+                        ],
                         sid,
                     )
-
-                    await emit_json("re_planning", RePlanningPayload().model_dump(), sid)
+                    replanned = True
+                    if plan_task is not None:  # drop the rest of a streaming plan
+                        plan_task.cancel()
+                        plan_task = plan_steps = None
+                    if speculative is not None:
+                        _drop_task(speculative[2])
+                        speculative = None
                     try:
                         revised_goal = (
                             f"Re-plan after command failure.\nOriginal goal: {goal}\n"
                             f"Failed step: {step}\nCommand: {command}\n"
-                            f"stderr: {_safe_str(result.get('stderr',''))[:2000]}\n"
-                            f"History: {json.dumps(history)[:4000]}"
+                            f"stderr: {stderr[:2000]}\n"
+                            f"History: {_history_snippet(history_json_parts)}"
                         )
-                        with PLANNER_LATENCY.time():
-                            plan_list = await asyncio.to_thread(
-                                api_client.run_planner,
-                                user_goal=revised_goal,
-                                session_id=session_id,
-                            )
+                        t0 = time.perf_counter()
+                        try:
+                            plan_list = await _run_planner(revised_goal, session_id)
+                        finally:
+                            PLANNER_LATENCY.observe(time.perf_counter() - t0)
                         step_index = 0
-                        await emit_json(
-                            "plan_generated",
-                            PlanGeneratedPayload(plan=plan_list).model_dump(),
-                            sid,
-                        )
+                        await emit_json("plan_generated", {"plan": plan_list}, sid)
                         continue
                     except Exception as e:
                         logger.error(
@@ -561,10 +1125,7 @@ async def execute_goal(sid, data):
                         )
                         await emit_json(
                             "error_detected",
-                            ErrorDetectedPayload(
-                                error=_cat(f"Re-planning failed: {e}", "planner"),
-                                failed_step=step,
-                            ).model_dump(),
+                            _error_event(f"Re-planning failed: {e}", "planner", step),
                             sid,
                         )
                         return
@@ -573,34 +1134,42 @@ async def execute_goal(sid, data):
                 step_index += 1
 
             # Workflow complete
-            await emit_json(
-                "workflow_complete",
-                WorkflowCompletePayload(status="success").model_dump(),
-                sid,
-            )
+            await flush_events(sid)
+            await sio.emit("workflow_complete", _WORKFLOW_OK_EVENT, to=sid)
             logger.info("workflow_complete", sid=sid, session_id=session_id)
 
+            # Only a freshly planned run that succeeded without re-planning is
+            # worth caching; write it in the background.
+            if cache is not None and cached_plan is None and not replanned:
+                stored = _PLANNER_EXECUTOR.submit(
+                    cache.store, goal, list(plan_list), goal_embedding
+                )
+                stored.add_done_callback(_log_plan_cache_store)
+
         except asyncio.CancelledError:
             # Cooperative cancellation
             logger.info("workflow_cancelled", sid=sid)
             await emit_json(
                 "error_detected",
-                ErrorDetectedPayload(
-                    error=_cat("Workflow cancelled", "cancelled"), failed_step="cancel"
-                ).model_dump(),
+                _error_event("Workflow cancelled", "cancelled", "cancel"),
                 sid,
             )
             raise
 
         finally:
-            # Cleanup registry
-            t = _RUNNING_TASKS.get(sid)
-            if t and t is asyncio.current_task():
-                _RUNNING_TASKS.pop(sid, None)
+            if plan_task is not None:
+                plan_task.cancel()
+            if speculative is not None:
+                _drop_task(speculative[2])
+            if steps_executed:
+                _STEPS_EXECUTED.inc(steps_executed)
+            if steps_failed:
+                _STEPS_FAILED.inc(steps_failed)
 
     # Spawn workflow task and await completion (allows cancellation on disconnect/shutdown)
     task = asyncio.create_task(_workflow(), name=f"workflow:{sid}")
     _RUNNING_TASKS[sid] = task
+    task.add_done_callback(functools.partial(_forget_task, sid))
     try:
         await task
     except asyncio.CancelledError:
@@ -613,5 +1182,7 @@ def build_asgi():
     """
     Returns the ASGI app (Socket.IO wrapped FastAPI) for uvicorn.
     Example: uvicorn agent_core.main:build_asgi --factory --reload
+    uvicorn sets up its event loop before calling this factory, so choose uvloop
+    with --loop uvloop (the default --loop auto already prefers it when installed).
     """
     return sio_app
@@ -1,7 +1,7 @@
 import json
 from typing import Any, Dict, List, Optional
 
-from agent_core import api_client
+from agent_core import api_client, plan_cache
 
 
 def create_initial_plan(
@@ -15,7 +15,14 @@ def create_initial_plan(
     - Delegates to api_client.run_planner() using GPT-5 with:
       reasoning.effort=medium, text.verbosity=low, optional tools via env toggles
     - Returns a list of short, imperative steps.
+    - Serves a cached plan instead when PLAN_CACHE_ENABLED and the goal (or a
+      close paraphrase) was planned before.
     """
+    cache = plan_cache.get_plan_cache()
+    if cache is not None:
+        cached, _ = cache.lookup(user_goal)
+        if cached is not None:
+            return cached
     steps = api_client.run_planner(
         user_goal=user_goal,
         session_id=session_id,
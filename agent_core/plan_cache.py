@@ -0,0 +1,235 @@
+"""
+Plan cache: reuse planner output for goals that were planned before.
+
+Lookups first try an exact fingerprint of the normalized goal, then (when an
+embedding function is available) the nearest cached goal by cosine similarity.
+Entries live in SQLite so the cache survives restarts; embeddings are mirrored
+in memory for the similarity scan.
+
+Enable with PLAN_CACHE_ENABLED=true. Settings:
+- PLAN_CACHE_PATH: SQLite file (default .plan_cache.sqlite3)
+- PLAN_CACHE_SIM: minimum cosine similarity for a semantic hit (default 0.9)
+- PLAN_CACHE_EMBED_MODEL: embedding model (default text-embedding-3-small)
+- PLAN_CACHE_MAX: entry cap; the least frequently hit entry is evicted (default 1000)
+- PLAN_CACHE_DEDUP_SIM: similarity above which a new goal counts as a duplicate
+  of a cached one and only bumps its hit count (default 0.97)
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+
+from agent_core import api_client
+
+logger = structlog.get_logger(__name__)
+
+EmbedFn = Callable[[str], Sequence[float]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_cache (
+    fingerprint TEXT PRIMARY KEY,
+    goal TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def normalize_goal(goal: str) -> str:
+    """Case- and whitespace-insensitive form of a goal used for fingerprinting."""
+    return " ".join(goal.lower().split())
+
+
+def fingerprint(goal: str) -> str:
+    return hashlib.sha256(normalize_goal(goal).encode("utf-8")).hexdigest()
+
+
+def _unit(vec: Sequence[float]) -> array:
+    """Return vec scaled to unit length as a compact float32 array."""
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return array("f", (x / norm for x in vec))
+
+
+class PlanCache:
+    """SQLite-backed plan store with exact and nearest-neighbour lookup.
+
+    Safe to share across threads; planner calls run on a worker pool.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        similarity: float = 0.9,
+        embed: Optional[EmbedFn] = None,
+        max_entries: int = 1000,
+        dedup_similarity: float = 0.97,
+    ):
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.dedup_similarity = dedup_similarity
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+        # fingerprint -> unit-length goal embedding
+        self._vectors: Dict[str, array] = {}
+        for fp, blob in self._db.execute(
+            "SELECT fingerprint, embedding FROM plan_cache WHERE embedding IS NOT NULL"
+        ):
+            vec = array("f")
+            vec.frombytes(blob)
+            self._vectors[fp] = vec
+
+    def embed(self, goal: str) -> Optional[array]:
+        """Unit-length embedding of the normalized goal, or None if unavailable."""
+        if self._embed is None:
+            return None
+        try:
+            return _unit(self._embed(normalize_goal(goal)))
+        except Exception as e:
+            logger.warning("plan_cache_embed_failed", error=str(e))
+            return None
+
+    def lookup(self, goal: str) -> Tuple[Optional[List[str]], Optional[array]]:
+        """Return (cached plan or None, goal embedding if one was computed).
+
+        The embedding is handed back so a later store() for the same goal does
+        not embed it twice.
+        """
+        fp = fingerprint(goal)
+        plan = self._hit(fp)
+        if plan is not None:
+            logger.info("plan_cache_hit", kind="exact")
+            return plan, None
+
+        vec = self.embed(goal)
+        if vec is None:
+            return None, None
+        best_fp, best_sim = self._nearest(vec)
+        if best_fp is not None and best_sim >= self.similarity:
+            plan = self._hit(best_fp)
+            if plan is not None:
+                logger.info("plan_cache_hit", kind="semantic", similarity=round(best_sim, 4))
+                return plan, vec
+        return None, vec
+
+    def store(self, goal: str, plan: List[str], embedding: Optional[array] = None) -> None:
+        """Insert or replace the plan cached for goal.
+
+        A goal that is a near-duplicate of a cached one only bumps that entry's
+        hit count. At capacity the least frequently hit entry is evicted.
+        """
+        if not plan:
+            return
+        fp = fingerprint(goal)
+        vec = embedding if embedding is not None else self.embed(goal)
+        if vec is not None:
+            dup_fp, dup_sim = self._nearest(vec)
+            if dup_fp is not None and dup_fp != fp and dup_sim > self.dedup_similarity:
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE plan_cache SET hits = hits + 1 WHERE fingerprint = ?", (dup_fp,)
+                    )
+                    self._db.commit()
+                return
+        with self._lock:
+            self._evict_for(fp)
+            self._db.execute(
+                "INSERT OR REPLACE INTO plan_cache"
+                " (fingerprint, goal, plan, embedding, created_at, hits)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                (
+                    fp,
+                    goal,
+                    json.dumps(plan),
+                    vec.tobytes() if vec is not None else None,
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+            if vec is not None:
+                self._vectors[fp] = vec
+
+    def _nearest(self, vec: array) -> Tuple[Optional[str], float]:
+        """Cached fingerprint whose goal embedding is closest to vec, and its cosine."""
+        best_fp, best_sim = None, -1.0
+        with self._lock:
+            for cand_fp, cand in self._vectors.items():
+                sim = sum(a * b for a, b in zip(vec, cand))
+                if sim > best_sim:
+                    best_fp, best_sim = cand_fp, sim
+        return best_fp, best_sim
+
+    def _evict_for(self, fp: str) -> None:
+        """Make room for fp (caller holds the lock): drop least-hit, then oldest, entries."""
+        exists = self._db.execute(
+            "SELECT 1 FROM plan_cache WHERE fingerprint = ?", (fp,)
+        ).fetchone()
+        if exists:
+            return
+        count = self._db.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0]
+        excess = count - self.max_entries + 1
+        if excess <= 0:
+            return
+        victims = [
+            row[0]
+            for row in self._db.execute(
+                "SELECT fingerprint FROM plan_cache ORDER BY hits ASC, created_at ASC LIMIT ?",
+                (excess,),
+            )
+        ]
+        self._db.executemany(
+            "DELETE FROM plan_cache WHERE fingerprint = ?", [(v,) for v in victims]
+        )
+        for victim in victims:
+            self._vectors.pop(victim, None)
+
+    def _hit(self, fp: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT plan FROM plan_cache WHERE fingerprint = ?", (fp,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE plan_cache SET hits = hits + 1 WHERE fingerprint = ?", (fp,))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0]
+
+
+@lru_cache(maxsize=1)
+def get_plan_cache() -> Optional[PlanCache]:
+    """Process-wide cache from the environment; None unless PLAN_CACHE_ENABLED is set."""
+    if os.getenv("PLAN_CACHE_ENABLED", "false").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    embed: Optional[EmbedFn] = None
+    if not api_client.get_config().terminus_fake:
+        model = os.getenv("PLAN_CACHE_EMBED_MODEL", "text-embedding-3-small")
+
+        def _embed_goal(text: str) -> List[float]:
+            return api_client.embed_text(text, model=model)
+
+        embed = _embed_goal
+
+    return PlanCache(
+        path=os.getenv("PLAN_CACHE_PATH", ".plan_cache.sqlite3"),
+        similarity=float(os.getenv("PLAN_CACHE_SIM", "0.9")),
+        embed=embed,
+        max_entries=int(os.getenv("PLAN_CACHE_MAX", "1000")),
+        dedup_similarity=float(os.getenv("PLAN_CACHE_DEDUP_SIM", "0.97")),
+    )
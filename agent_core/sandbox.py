@@ -3,8 +3,38 @@ import re
 import shlex
 import shutil
 import asyncio
+import codecs
+import secrets
 import subprocess
-from typing import Dict, List, Tuple
+import threading
+import weakref
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+# on_output(stream, text): called with "stdout"/"stderr" and each decoded chunk
+OutputCallback = Callable[[str, str], Awaitable[None]]
+
+# Streamed runs read pipes in chunks of this size and keep only this much of the
+# end of each stream for the final result
+_STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_TAIL_BYTES = int(os.getenv("SANDBOX_STREAM_TAIL_BYTES", str(64 * 1024)))
+
+
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
 
 
 def _env_flag(name: str, default: str = "false") -> bool:
@@ -12,7 +42,7 @@ def _env_flag(name: str, default: str = "false") -> bool:
 
     Accepts common true-ish values: 1/true/yes/on (case-insensitive).
     """
-    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+    return os.getenv(name, default).strip().lower() in _TRUTHY
 
 
 def _split_allowlist(value: str) -> List[str]:
@@ -22,119 +52,456 @@ def _split_allowlist(value: str) -> List[str]:
     return [x.strip() for x in value.split(",") if x.strip()]
 
 
+@dataclass(frozen=True, slots=True)
+class _SandboxConfig:
+    """Immutable snapshot of the environment-driven sandbox settings."""
+
+    max_command_len: int
+    strict_sanitize: bool
+    allowlist: FrozenSet[str]
+    force_local: bool
+    # Persistent bash workers for venv commands; 0 spawns a shell per command
+    shell_workers: int
+
+
+@lru_cache(maxsize=1)
+def get_config() -> _SandboxConfig:
+    """Read the sandbox environment once; refresh_env_cache() re-reads it."""
+    return _SandboxConfig(
+        max_command_len=int(os.getenv("MAX_COMMAND_LEN", "2000")),
+        strict_sanitize=_env_flag("SANDBOX_STRICT_SANITIZE", "true"),
+        allowlist=frozenset(_split_allowlist(os.getenv("SANDBOX_CMD_ALLOWLIST", ""))),
+        force_local=_env_flag("SANDBOX_FORCE_LOCAL", "false"),
+        shell_workers=max(0, int(os.getenv("SANDBOX_SHELL_WORKERS", "0"))),
+    )
+
+
+def refresh_env_cache() -> None:
+    """Drop the cached sandbox settings so the next call re-reads the environment."""
+    get_config.cache_clear()
+
+
+# Byte classes rejected by the sanitizer. Both are ASCII, and UTF-8 never uses
+# ASCII bytes inside multi-byte sequences, so scanning the encoded command is exact.
+_LINE_BREAK_BYTES = b"\n\r\x00"
+_CONTROL_BYTES = bytes(range(0x00, 0x09)) + b"\x0b\x0c" + bytes(range(0x0E, 0x20)) + b"\x7f"
+_REJECT_BYTES = _LINE_BREAK_BYTES + _CONTROL_BYTES
+
+
+# Characters that give shlex work to do inside a word
+_QUOTING_CHARS = frozenset("'\"\\")
+
+
+def _first_token(cmd: str) -> Tuple[str, bool]:
+    """
+    First argv word of cmd as shlex.split would see it, and whether the whole
+    command had to be tokenized to find it.
+
+    A first word without quotes or backslashes ends at the first space or tab,
+    so it is sliced directly in O(len(word)); only quoted words pay for shlex.
+    """
+    head = cmd.lstrip(" \t")
+    end = len(head)
+    for sep in (" ", "\t"):
+        i = head.find(sep, 0, end)
+        if i != -1:
+            end = i
+    token = head[:end]
+    if token and _QUOTING_CHARS.isdisjoint(token):
+        return token, False
+    return shlex.split(cmd)[0], True
+
+
 def _sanitize_command(cmd: str) -> Tuple[bool, str]:
     """
     Basic sanitizer to reduce injection risk while allowing useful commands.
     Policy:
-      - Enforce single-line (no newlines, carriage returns, NULs).
       - Enforce max length.
+      - Optional allowlist on first argv token (checked first; cheapest reject).
+      - Enforce single-line (no newlines, carriage returns, NULs).
       - Optional strict control-char rejection.
-      - Optional allowlist on first argv token.
     Returns (ok, error_message)
     """
-    max_len = int(os.getenv("MAX_COMMAND_LEN", "2000"))
+    cfg = get_config()
+    max_len = cfg.max_command_len
     if not isinstance(cmd, str) or not cmd.strip():
         return False, "Empty command"
     if len(cmd) > max_len:
         return False, f"Command exceeds maximum length of {max_len} characters"
 
-    # Disallow newlines and NUL
-    if any(ch in cmd for ch in ("\n", "\r", "\x00")):
-        return False, "Command contains disallowed newline or NUL characters"
-
-    # Optional strict control-char rejection
-    if _env_flag("SANDBOX_STRICT_SANITIZE", "true"):
-        # Reject ASCII control chars excluding horizontal tab (allow tabs)
-        if re.search(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]", cmd):
-            return False, "Command contains disallowed control characters"
-
-    # Optional allowlist: match first argv token using shell-like splitting
-    allow = _split_allowlist(os.getenv("SANDBOX_CMD_ALLOWLIST", ""))
+    # Optional allowlist first: an unknown first word is rejected after looking
+    # at that word alone, before any full-length scan
+    allow = cfg.allowlist
     if allow:
         try:
-            first = shlex.split(cmd)[0]
+            first, tokenized = _first_token(cmd)
+            if first in allow and not tokenized and not _QUOTING_CHARS.isdisjoint(cmd):
+                shlex.split(cmd)  # the rest must still tokenize (e.g. balanced quotes)
         except Exception:
             return False, "Unable to parse command for allowlist check"
         if first not in allow:
             return False, f"Command '{first}' not permitted by allowlist"
 
+    # One C-level pass: deleting every rejectable byte only shrinks a bad command
+    raw = cmd.encode("utf-8", "surrogatepass")
+    if len(raw.translate(None, _REJECT_BYTES)) != len(raw):
+        # Disallow newlines and NUL
+        if len(raw.translate(None, _LINE_BREAK_BYTES)) != len(raw):
+            return False, "Command contains disallowed newline or NUL characters"
+        # Optional strict control-char rejection (horizontal tab is allowed)
+        if cfg.strict_sanitize:
+            return False, "Command contains disallowed control characters"
+
     return True, ""
 
-async def _execute_command_unmanaged_async(command: str) -> Dict[str, object]:
+# The demo virtualenv layout is static, so its activated environment is computed
+# once here instead of sourcing bin/activate in an extra shell for every command.
+VENV_DIR = os.path.join(os.getcwd(), ".venv_demo")
+VENV_BIN = os.path.join(VENV_DIR, "bin")
+VENV_VARS: Dict[str, str] = {
+    "VIRTUAL_ENV": VENV_DIR,
+    "PATH": f"{VENV_BIN}{os.pathsep}{os.environ.get('PATH', os.defpath)}",
+}
+VENV_ENV: Dict[str, str] = {
+    **{k: v for k, v in os.environ.items() if k != "PYTHONHOME"},
+    **VENV_VARS,
+}
+
+# Account commands run as under sudo
+_RUN_AS_USER = "root"
+
+# Resolved once: shutil.which stats every PATH entry, too costly to repeat per step
+_SUDO_PATH = shutil.which("sudo")
+
+
+def refresh_sudo_path() -> None:
+    """Re-resolve the sudo binary, e.g. after PATH changed."""
+    global _SUDO_PATH
+    _SUDO_PATH = shutil.which("sudo")
+
+
+# Characters that need a shell to mean what they say (pipes, redirects,
+# expansions, globbing, grouping). Commands free of them can be exec'd directly.
+_SHELL_META_RE = re.compile(r"[|&;<>()$`\\*?\[\]{}~#!]")
+
+
+def _direct_argv(command: str) -> List[str]:
+    """
+    argv for running command without a shell, or [] when a shell is required.
+
+    Only used while an allowlist is active, where the first token has already
+    been vetted and shell features are not expected.
+    """
+    if not get_config().allowlist:
+        return []
+    if _SHELL_META_RE.search(command):
+        return []
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return []
+    if not argv or "=" in argv[0]:
+        return []
+    return argv
+
+
+async def _pump(
+    reader: asyncio.StreamReader, name: str, on_output: OutputCallback, tail: bytearray
+) -> None:
+    """Forward one pipe to on_output as it arrives, keeping a bounded tail."""
+    # Incremental decoding so a multi-byte character split across reads stays intact
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while chunk := await reader.read(_STREAM_CHUNK_BYTES):
+        tail += chunk
+        if len(tail) > STREAM_TAIL_BYTES:
+            del tail[:-STREAM_TAIL_BYTES]
+        text = decoder.decode(chunk)
+        if text:
+            await on_output(name, text)
+    text = decoder.decode(b"", final=True)
+    if text:
+        await on_output(name, text)
+
+
+async def _communicate(
+    proc: asyncio.subprocess.Process, on_output: Optional[OutputCallback] = None
+) -> Dict[str, object]:
+    if on_output is None:
+        stdout, stderr = await proc.communicate()
+        return {
+            "stdout": stdout.decode(errors="replace"),
+            "stderr": stderr.decode(errors="replace"),
+            "exit_code": proc.returncode,
+        }
+    out_tail, err_tail = bytearray(), bytearray()
+    try:
+        await asyncio.gather(
+            _pump(proc.stdout, "stdout", on_output, out_tail),
+            _pump(proc.stderr, "stderr", on_output, err_tail),
+        )
+        await proc.wait()
+    except BaseException:
+        # Nobody is listening any more (cancelled or the callback failed)
+        if proc.returncode is None:
+            proc.kill()
+        raise
+    return {
+        "stdout": out_tail.decode(errors="replace"),
+        "stderr": err_tail.decode(errors="replace"),
+        "exit_code": proc.returncode,
+    }
+
+
+async def _execute_command_unmanaged_async(
+    command: str, venv: bool = False, on_output: Optional[OutputCallback] = None
+) -> Dict[str, object]:
     """
-    Private: Execute a command without virtualenv activation, asynchronously.
+    Private: Execute a command asynchronously, optionally inside the demo virtualenv.
+
+    With on_output, output is forwarded as it is produced and the result holds
+    only the last STREAM_TAIL_BYTES of each stream.
     """
     ok, err = _sanitize_command(command)
     if not ok:
         return {"stdout": "", "stderr": f"Rejected: {err}", "exit_code": -2}
 
-    user = "root"
-    force_local = _env_flag("SANDBOX_FORCE_LOCAL", "false")
+    cfg = get_config()
+    user = _RUN_AS_USER
+    force_local = cfg.force_local
+    argv = _direct_argv(command)
+    pipes = {"stdout": asyncio.subprocess.PIPE, "stderr": asyncio.subprocess.PIPE}
+
+    if venv and cfg.shell_workers and not argv and on_output is None:
+        result = await _run_in_worker(command, cfg.shell_workers)
+        if result is not None:
+            return result
 
     async def _run_local_async() -> Dict[str, object]:
+        env = VENV_ENV if venv else None
         try:
-            proc = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            stdout, stderr = await proc.communicate()
-            return {
-                "stdout": stdout.decode(),
-                "stderr": stderr.decode(),
-                "exit_code": proc.returncode,
-            }
+            if argv:
+                proc = await asyncio.create_subprocess_exec(*argv, env=env, **pipes)
+            else:
+                proc = await asyncio.create_subprocess_shell(command, env=env, **pipes)
+            return await _communicate(proc, on_output)
         except Exception as e:
             return {"stdout": "", "stderr": str(e), "exit_code": -1}
 
     # Prefer sudo sandbox unless forced local or prerequisites missing
     if not force_local:
-        sudo_path = shutil.which("sudo")
+        sudo_path = _SUDO_PATH
         if sudo_path:
+            # sudo resets the environment, so the venv variables travel via env(1)
+            prefix = [sudo_path, "-u", user]
+            if venv:
+                prefix += ["env", *(f"{k}={v}" for k, v in VENV_VARS.items())]
+            if argv:
+                full = prefix + argv
+            elif venv:
+                full = prefix + ["bash", "-c", command]
+            else:
+                full = prefix + ["bash", "-lc", command]
             try:
-                proc = await asyncio.create_subprocess_exec(
-                    sudo_path,
-                    "-u",
-                    user,
-                    "bash",
-                    "-lc",
-                    command,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                stdout, stderr = await proc.communicate()
-                return {
-                    "stdout": stdout.decode(),
-                    "stderr": stderr.decode(),
-                    "exit_code": proc.returncode,
-                }
+                proc = await asyncio.create_subprocess_exec(*full, **pipes)
             except Exception:
                 return await _run_local_async()
+            return await _communicate(proc, on_output)
         else:
             return await _run_local_async()
 
     return await _run_local_async()
 
 
+# ---- Persistent shell workers (SANDBOX_SHELL_WORKERS) ----
+
+
+class _WorkerGone(Exception):
+    """The worker shell exited or its pipes closed mid-command."""
+
+
+async def _read_frame(reader: asyncio.StreamReader, marker: bytes) -> Tuple[bytes, bytes]:
+    """Read up to marker; return (output before it, rest of the marker's line)."""
+    buf = bytearray()
+    searched = 0
+    while True:
+        chunk = await reader.read(_STREAM_CHUNK_BYTES)
+        if not chunk:
+            raise _WorkerGone("worker shell closed its output")
+        buf += chunk
+        i = buf.find(marker, max(0, searched - len(marker) + 1))
+        if i != -1:
+            break
+        searched = len(buf)
+    rest = buf[i + len(marker) :]
+    while b"\n" not in rest:
+        chunk = await reader.read(_STREAM_CHUNK_BYTES)
+        if not chunk:
+            raise _WorkerGone("worker shell closed its output")
+        rest += chunk
+    return bytes(buf[:i]), bytes(rest.partition(b"\n")[0])
+
+
+class _ShellWorker:
+    """
+    A long-lived bash (no profile/rc) that runs one command at a time.
+
+    Each command runs in a subshell, so cd/exit/variables do not leak into the
+    next one. Completion is framed on both pipes by a NUL + random nonce marker
+    that command output cannot forge, followed on stdout by the exit status.
+    """
+
+    def __init__(self, proc: asyncio.subprocess.Process):
+        self.proc = proc
+
+    @classmethod
+    async def spawn(cls) -> "_ShellWorker":
+        shell = ["bash", "--noprofile", "--norc"]
+        env: Optional[Dict[str, str]] = None
+        if not get_config().force_local and _SUDO_PATH:
+            venv_vars = [f"{k}={v}" for k, v in VENV_VARS.items()]
+            argv = [_SUDO_PATH, "-u", _RUN_AS_USER, "env", *venv_vars, *shell]
+        else:
+            argv, env = shell, VENV_ENV
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        return cls(proc)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    def kill(self) -> None:
+        if self.alive:
+            self.proc.kill()
+
+    async def run(self, command: str) -> Dict[str, object]:
+        nonce = secrets.token_hex(16)
+        # The sanitizer guarantees a single line, so one quoted eval is exact
+        line = (
+            f"( eval {shlex.quote(command)} ) </dev/null; "
+            f"printf '\\0{nonce} %d\\n' $?; printf '\\0{nonce}\\n' >&2\n"
+        )
+        marker = b"\0" + nonce.encode()
+        try:
+            self.proc.stdin.write(line.encode("utf-8", "surrogatepass"))
+            await self.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise _WorkerGone(str(e)) from e
+        (stdout, status), (stderr, _) = await asyncio.gather(
+            _read_frame(self.proc.stdout, marker),
+            _read_frame(self.proc.stderr, marker),
+        )
+        return {
+            "stdout": stdout.decode(errors="replace"),
+            "stderr": stderr.decode(errors="replace"),
+            "exit_code": int(status),
+        }
+
+
+# Idle workers per event loop (subprocess pipes belong to the loop that made
+# them); None marks a free slot whose worker is spawned on first use.
+_SHELL_POOLS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Queue]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _run_in_worker(command: str, size: int) -> Optional[Dict[str, object]]:
+    """
+    Run command on a pooled shell worker.
+
+    Returns None if no worker could be started (the caller spawns a shell as
+    usual); a worker lost mid-command is reported as a failed step rather than
+    retried, since the command may already have had effects.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _SHELL_POOLS.get(loop)
+    if pool is None:
+        pool = _SHELL_POOLS[loop] = asyncio.Queue()
+        for _ in range(size):
+            pool.put_nowait(None)
+    worker: Optional[_ShellWorker] = await pool.get()
+    try:
+        if worker is None or not worker.alive:
+            try:
+                worker = await _ShellWorker.spawn()
+            except Exception:
+                worker = None
+                return None
+        try:
+            return await worker.run(command)
+        except _WorkerGone as e:
+            worker.kill()
+            worker = None
+            return {"stdout": "", "stderr": f"sandbox shell exited: {e}", "exit_code": -1}
+    except BaseException:
+        # Cancelled mid-command: the shell is in an unknown state, so drop it
+        if worker is not None:
+            worker.kill()
+            worker = None
+        raise
+    finally:
+        pool.put_nowait(worker)
+
+
+async def aclose_shell_workers() -> None:
+    """Stop the running loop's shell workers (call on server shutdown)."""
+    pool = _SHELL_POOLS.pop(asyncio.get_running_loop(), None)
+    while pool is not None and not pool.empty():
+        worker = pool.get_nowait()
+        if worker is not None and worker.alive:
+            worker.kill()
+            await worker.proc.wait()
+
+
+# One private event loop per calling thread for the synchronous wrappers, reused
+# across calls instead of building and tearing down a loop per command.
+_sync_loops = threading.local()
+
+
+def _run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run coro to completion for a caller that has no running event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError(
+            "synchronous sandbox call inside a running event loop; await the async variant"
+        )
+    loop = getattr(_sync_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _sync_loops.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+
 def _execute_command_unmanaged(command: str) -> Dict[str, object]:
     """
     Synchronous wrapper for the async unmanaged command execution.
     """
-    return asyncio.run(_execute_command_unmanaged_async(command))
+    return _run_sync(_execute_command_unmanaged_async(command))
 
 
-async def execute_command_async(command: str) -> Dict[str, object]:
+async def execute_command_async(
+    command: str, on_output: Optional[OutputCallback] = None
+) -> Dict[str, object]:
     """
     Execute a command asynchronously within the project's .venv_demo virtual environment.
+
+    Pass on_output to receive stdout/stderr chunks while the command runs.
     """
-    venv_activate_path = os.path.join(os.getcwd(), ".venv_demo", "bin", "activate")
-    wrapped_command = f"source '{venv_activate_path}' && {command}"
-    return await _execute_command_unmanaged_async(wrapped_command)
+    return await _execute_command_unmanaged_async(command, venv=True, on_output=on_output)
 
 
 def execute_command(command: str) -> Dict[str, object]:
     """
     Execute a command synchronously within the project's .venv_demo virtual environment.
     """
-    return asyncio.run(execute_command_async(command))
-    return _execute_command_unmanaged(wrapped_command)
+    return _run_sync(execute_command_async(command))
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, TypedDict
 
 from pydantic import BaseModel
 
@@ -11,11 +11,21 @@ class PlanGeneratedPayload(BaseModel):
     plan: List[str]
 
 
+class PlanStepAddedPayload(BaseModel):
+    index: int
+    step: str
+
+
 class StepExecutingPayload(BaseModel):
     step: str
     command: Optional[str] = None
 
 
+class StepOutputPayload(BaseModel):
+    stream: str  # "stdout" or "stderr"
+    data: str
+
+
 class StepResultPayload(BaseModel):
     stdout: str
     stderr: str
@@ -33,3 +43,37 @@ class RePlanningPayload(BaseModel):
 
 class WorkflowCompletePayload(BaseModel):
     status: str
+
+
+# Emit-only payloads are built as plain dicts on the hot path; these mirror the
+# models above for type checking without a validate/dump round-trip.
+
+
+class PlanGeneratedEvent(TypedDict):
+    plan: List[str]
+
+
+class PlanStepAddedEvent(TypedDict):
+    index: int
+    step: str
+
+
+class StepExecutingEvent(TypedDict):
+    step: str
+    command: str
+
+
+class StepOutputEvent(TypedDict):
+    stream: str
+    data: str
+
+
+class StepResultEvent(TypedDict):
+    stdout: str
+    stderr: str
+    exit_code: int
+
+
+class ErrorDetectedEvent(TypedDict):
+    error: str
+    failed_step: str
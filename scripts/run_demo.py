@@ -33,7 +33,8 @@ GOAL = os.getenv("GOAL", "print hello -> cause failure -> remediate -> done")
 
 
 async def main() -> int:
-    sio = socketio.AsyncClient()
+    # Must match the backend's SOCKETIO_SERIALIZER ("default" JSON or "msgpack")
+    sio = socketio.AsyncClient(serializer=os.getenv("SOCKETIO_SERIALIZER", "default"))
 
     async def pprint_event(name: str, payload: Dict[str, Any]):
         print(f"\n== {name} ==")
@@ -52,9 +53,15 @@ async def main() -> int:
     async def on_plan_generated(payload):
         await pprint_event("plan_generated", payload)
 
+    async def on_plan_step_added(payload):
+        await pprint_event("plan_step_added", payload)
+
     async def on_step_executing(payload):
         await pprint_event("step_executing", payload)
 
+    async def on_step_output(payload):
+        await pprint_event("step_output", payload)
+
     async def on_step_result(payload):
         await pprint_event("step_result", payload)
 
@@ -64,6 +71,11 @@ async def main() -> int:
     async def on_replanning(payload):
         await pprint_event("re_planning", payload)
 
+    async def on_batch(payload):
+        # Server-side coalescing (SOCKETIO_BATCH_EVENTS): replay each frame in order
+        for frame in payload.get("payload", {}).get("events", []):
+            await pprint_event(frame.get("type", "?"), frame)
+
     async def on_workflow_complete(payload):
         await pprint_event("workflow_complete", payload)
         # Auto-disconnect after completion
@@ -82,10 +94,13 @@ async def main() -> int:
 
     sio.on("status", on_status)
     sio.on("plan_generated", on_plan_generated)
+    sio.on("plan_step_added", on_plan_step_added)
     sio.on("step_executing", on_step_executing)
+    sio.on("step_output", on_step_output)
     sio.on("step_result", on_step_result)
     sio.on("error_detected", on_error_detected)
     sio.on("re_planning", on_replanning)
+    sio.on("batch", on_batch)
     sio.on("workflow_complete", on_workflow_complete)
 
     try:
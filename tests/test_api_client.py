@@ -27,6 +27,8 @@ class DummyOpenAIClient:
 def ensure_env(monkeypatch):
     # Make sure the key exists so client construction doesn't fail
     monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    # Start each test with a cold executor cache so HTTP mocks see every request
+    api_client._EXECUTOR_CACHE.clear()
     yield
 
 
@@ -81,3 +83,152 @@ def test_executor_calls_local_api(httpx_mock):
     
     import json
     assert json.loads(request.read().decode()) == {"prompt": "list files", "max_new_tokens": 256}
+
+
+def _status_error(status, headers=None):
+    import httpx
+    from openai import APIStatusError
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    response = Response(status, headers=headers or {}, request=request)
+    return APIStatusError("error", response=response, body=None)
+
+
+def test_retry_honors_retry_after(monkeypatch):
+    # Arrange: first call is rate limited with a server hint, second succeeds
+    sleeps = []
+    monkeypatch.setattr(api_client.time, "sleep", sleeps.append)
+    calls = iter([_status_error(429, {"retry-after": "3"}), "ok"])
+
+    def fn():
+        item = next(calls)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    # Act / Assert
+    assert api_client._retry(fn) == "ok"
+    assert sleeps == [3.0]
+
+
+def test_retry_does_not_retry_client_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(api_client.time, "sleep", sleeps.append)
+
+    def fn():
+        raise _status_error(400)
+
+    with pytest.raises(Exception):
+        api_client._retry(fn)
+    assert sleeps == []
+
+
+def test_executor_batch_preserves_order(httpx_mock):
+    # Arrange: echo the prompt back so each command is tied to its sub-task
+    import json
+
+    def respond(request):
+        prompt = json.loads(request.read().decode())["prompt"]
+        return Response(200, json={"command": f"echo {prompt}"})
+
+    for _ in range(3):
+        httpx_mock.add_callback(respond, url=api_client.EXECUTOR_API_URL)
+
+    # Act
+    import asyncio
+
+    commands = asyncio.run(api_client.run_executor_batch(["a", "b", "c"], session_id="sess123"))
+
+    # Assert
+    assert commands == ["echo a", "echo b", "echo c"]
+
+
+def test_responses_compat_filters_unsupported_kwargs(monkeypatch):
+    # Arrange: an SDK whose create() predates response_format
+    seen = {}
+
+    class Responses:
+        def create(self, *, model, input, metadata=None):
+            seen.update(model=model, input=input, metadata=metadata)
+            return "resp"
+
+    class Client:
+        responses = Responses()
+
+    monkeypatch.setattr(api_client, "client", Client())
+
+    # Act
+    resp = api_client._responses_create_compat(
+        {"model": "m", "input": [], "metadata": {"a": 1}, "response_format": {"type": "json"}}
+    )
+
+    # Assert
+    assert resp == "resp"
+    assert seen == {"model": "m", "input": [], "metadata": {"a": 1}}
+
+
+def test_planner_recovers_fenced_json(monkeypatch):
+    # Arrange: JSON inside a markdown fence with leading prose and a drifted key
+    text = 'Here is the plan:\n```json\n{"steps": ["first", "second"]}\n```'
+
+    def create_impl(**kwargs):
+        return DummyResponse(output_text=text)
+
+    monkeypatch.setattr(api_client, "client", DummyOpenAIClient(create_impl))
+
+    # Act
+    steps = api_client.run_planner(user_goal="Do something", session_id="sess123")
+
+    # Assert
+    assert steps == ["first", "second"]
+
+
+def test_executor_cache_skips_repeat_requests(httpx_mock):
+    # Arrange: a single response; the second call must be served from cache
+    httpx_mock.add_response(url=api_client.EXECUTOR_API_URL, json={"command": "ls -l"})
+
+    # Act
+    first = api_client.run_executor(sub_task="list files", session_id="sess1")
+    second = api_client.run_executor(sub_task="list files", session_id="sess2")
+
+    # Assert
+    assert first == second == "ls -l"
+    assert len(httpx_mock.get_requests()) == 1
+
+
+def test_stream_planner_yields_steps_incrementally(monkeypatch):
+    # Arrange: deltas split mid-string, including an escaped quote
+    from types import SimpleNamespace
+
+    deltas = ['{"pl', 'an": ["step ', 'one", "say \\"hi', '\\"", ', '"three"]}']
+    seen = []
+
+    class Stream:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def __iter__(self):
+            for d in deltas:
+                seen.append(d)
+                yield SimpleNamespace(type="response.output_text.delta", delta=d)
+
+    class Responses:
+        def stream(self, **kwargs):
+            return Stream()
+
+    class Client:
+        responses = Responses()
+
+    monkeypatch.setattr(api_client, "client", Client())
+
+    # Act
+    gen = api_client.stream_planner(user_goal="Do something", session_id="sess123")
+    first = next(gen)
+
+    # Assert: the first step is available before the stream is exhausted
+    assert first == "step one"
+    assert len(seen) < len(deltas)
+    assert list(gen) == ['say "hi"', "three"]
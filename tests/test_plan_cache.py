@@ -0,0 +1,60 @@
+from agent_core import plan_cache
+from agent_core.plan_cache import PlanCache
+
+
+def _embed(text):
+    # Tiny deterministic "embedding": letter histogram over a-e
+    return [text.count(c) + 0.01 for c in "abcde"]
+
+
+def test_exact_hit_ignores_case_and_whitespace(tmp_path):
+    cache = PlanCache(str(tmp_path / "c.db"))
+    cache.store("List  files", ["ls -la"])
+    plan, _ = cache.lookup("  list FILES ")
+    assert plan == ["ls -la"]
+
+
+def test_semantic_hit_and_miss(tmp_path):
+    cache = PlanCache(str(tmp_path / "c.db"), similarity=0.99, embed=_embed)
+    cache.store("abc abc", ["echo abc"])
+    plan, vec = cache.lookup("abc abc abc")  # same direction, different fingerprint
+    assert plan == ["echo abc"]
+    assert vec is not None
+    plan, _ = cache.lookup("eeee")
+    assert plan is None
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "c.db")
+    PlanCache(path, embed=_embed).store("abc", ["echo abc"])
+    reopened = PlanCache(path, similarity=0.99, embed=_embed)
+    assert len(reopened) == 1
+    assert reopened.lookup("abcabc")[0] == ["echo abc"]
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("PLAN_CACHE_ENABLED", raising=False)
+    plan_cache.get_plan_cache.cache_clear()
+    try:
+        assert plan_cache.get_plan_cache() is None
+    finally:
+        plan_cache.get_plan_cache.cache_clear()
+
+
+def test_evicts_least_frequently_hit_entry(tmp_path):
+    cache = PlanCache(str(tmp_path / "c.db"), max_entries=2)
+    cache.store("first", ["echo 1"])
+    cache.store("second", ["echo 2"])
+    assert cache.lookup("first")[0] == ["echo 1"]  # first now has a hit
+    cache.store("third", ["echo 3"])
+    assert len(cache) == 2
+    assert cache.lookup("second")[0] is None
+    assert cache.lookup("first")[0] == ["echo 1"]
+    assert cache.lookup("third")[0] == ["echo 3"]
+
+
+def test_near_duplicate_goal_is_not_inserted(tmp_path):
+    cache = PlanCache(str(tmp_path / "c.db"), embed=_embed, dedup_similarity=0.97)
+    cache.store("abc", ["echo abc"])
+    cache.store("abc abc", ["echo other"])  # same embedding direction
+    assert len(cache) == 1
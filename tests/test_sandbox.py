@@ -8,7 +8,10 @@ def strict_env(monkeypatch):
     monkeypatch.setenv("SANDBOX_STRICT_SANITIZE", "true")
     monkeypatch.setenv("MAX_COMMAND_LEN", "256")
     # Do not set SANDBOX_CMD_ALLOWLIST by default (no allowlist)
+    monkeypatch.delenv("SANDBOX_CMD_ALLOWLIST", raising=False)
+    sandbox.refresh_env_cache()
     yield
+    sandbox.refresh_env_cache()
 
 
 def test_rejects_empty_command():
@@ -31,6 +34,7 @@ def test_rejects_control_chars():
 
 def test_rejects_excessive_length(monkeypatch):
     monkeypatch.setenv("MAX_COMMAND_LEN", "10")
+    sandbox.refresh_env_cache()
     res = sandbox.execute_command("echo this is too long")
     assert res["exit_code"] == -2
     assert "exceeds" in res["stderr"].lower()
@@ -38,6 +42,7 @@ def test_rejects_excessive_length(monkeypatch):
 
 def test_allowlist_blocks_unlisted(monkeypatch):
     monkeypatch.setenv("SANDBOX_CMD_ALLOWLIST", "echo")
+    sandbox.refresh_env_cache()
     res = sandbox.execute_command("uname -a")
     assert res["exit_code"] == -2
     assert "not permitted" in res["stderr"].lower()
@@ -48,9 +53,84 @@ def test_allowlist_allows_listed(monkeypatch):
     # In CI or local dev without configured sudoers, this may return -1 with stderr explaining sudo not available.
     # We assert only that the sanitizer does not block 'echo' when allowlisted.
     monkeypatch.setenv("SANDBOX_CMD_ALLOWLIST", "echo")
+    sandbox.refresh_env_cache()
     res = sandbox.execute_command("echo ok")
     # exit_code may be 0 in properly configured environments, else -1 if sudo not available.
     assert "stderr" in res and "stdout" in res and "exit_code" in res
     # If executed, stdout should contain 'ok'
     if res["exit_code"] == 0:
         assert res["stdout"].strip() == "ok"
+
+
+def test_non_utf8_output_is_decoded_with_replacement(monkeypatch):
+    monkeypatch.setenv("SANDBOX_FORCE_LOCAL", "true")
+    sandbox.refresh_env_cache()
+    res = sandbox._execute_command_unmanaged("printf 'ok\\377'")
+    assert res["exit_code"] == 0
+    assert res["stdout"] == "ok�"
+
+
+def test_venv_environment_is_applied_without_activate(monkeypatch):
+    monkeypatch.setenv("SANDBOX_FORCE_LOCAL", "true")
+    sandbox.refresh_env_cache()
+    res = sandbox.execute_command("printenv VIRTUAL_ENV")
+    assert res["exit_code"] == 0
+    assert res["stdout"].strip() == sandbox.VENV_DIR
+
+
+def test_allowlisted_plain_command_skips_the_shell(monkeypatch):
+    monkeypatch.setenv("SANDBOX_CMD_ALLOWLIST", "echo")
+    sandbox.refresh_env_cache()
+    assert sandbox._direct_argv("echo 'a b' c") == ["echo", "a b", "c"]
+    assert sandbox._direct_argv("echo $HOME") == []
+    assert sandbox._direct_argv("echo a | cat") == []
+    monkeypatch.delenv("SANDBOX_CMD_ALLOWLIST")
+    sandbox.refresh_env_cache()
+    assert sandbox._direct_argv("echo ok") == []
+
+
+def test_sanitizer_allows_tabs_and_honors_strict_flag(monkeypatch):
+    assert sandbox._sanitize_command("echo\tok") == (True, "")
+    assert sandbox._sanitize_command("echo é\x1b")[0] is False
+    monkeypatch.setenv("SANDBOX_STRICT_SANITIZE", "false")
+    sandbox.refresh_env_cache()
+    assert sandbox._sanitize_command("echo é\x1b") == (True, "")
+    assert "newline" in sandbox._sanitize_command("echo a\rb")[1].lower()
+
+
+def test_streamed_output_reaches_callback_and_result_keeps_tail(monkeypatch):
+    monkeypatch.setenv("SANDBOX_FORCE_LOCAL", "true")
+    sandbox.refresh_env_cache()
+    monkeypatch.setattr(sandbox, "STREAM_TAIL_BYTES", 4)
+    seen = []
+
+    async def on_output(stream, text):
+        seen.append((stream, text))
+
+    res = sandbox._run_sync(
+        sandbox.execute_command_async("printf 'hello world'; printf oops >&2", on_output)
+    )
+    assert res["exit_code"] == 0
+    assert "".join(t for s, t in seen if s == "stdout") == "hello world"
+    assert "".join(t for s, t in seen if s == "stderr") == "oops"
+    assert res["stdout"] == "orld"
+    assert res["stderr"] == "oops"
+
+
+def test_shell_workers_run_commands_in_isolated_subshells(monkeypatch):
+    monkeypatch.setenv("SANDBOX_FORCE_LOCAL", "true")
+    monkeypatch.setenv("SANDBOX_SHELL_WORKERS", "1")
+    sandbox.refresh_env_cache()
+
+    async def scenario():
+        try:
+            first = await sandbox.execute_command_async("cd / && printf ok; echo err >&2; exit 3")
+            second = await sandbox.execute_command_async("pwd")
+            return first, second
+        finally:
+            await sandbox.aclose_shell_workers()
+
+    first, second = sandbox._run_sync(scenario())
+    assert first == {"stdout": "ok", "stderr": "err\n", "exit_code": 3}
+    assert second["exit_code"] == 0
+    assert second["stdout"].strip() != "/"
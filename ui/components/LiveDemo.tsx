@@ -35,15 +35,27 @@ export default function LiveDemo() {
         setIsExecuting(true);
       }),
 
+      // Streaming planner (PLANNER_STREAMING): steps arrive one at a time
+      socketClient.on("plan_step_added", (payload) => {
+        setCurrentPlan((plan) => [...plan.slice(0, payload.index), payload.step]);
+        setIsExecuting(true);
+      }),
+
       socketClient.on("status", (payload) => {
         if (payload?.message) setStatusMsg(payload.message);
       }),
 
       socketClient.on("step_executing", (payload) => {
         setCurrentStep(payload.step);
+        setLastResult("");
         setError("");
       }),
 
+      // Streamed sandbox output (SANDBOX_STREAM_OUTPUT): append as it arrives
+      socketClient.on("step_output", (payload) => {
+        setLastResult((prev) => prev + payload.data);
+      }),
+
       socketClient.on("step_result", (payload) => {
         setLastResult(`Exit Code: ${payload.exit_code}\nStdout: ${payload.stdout}\nStderr: ${payload.stderr}`);
       }),
@@ -6,7 +6,9 @@ export interface SocketEvents {
   // From server
   status: (payload: { message: string }) => void;
   plan_generated: (payload: { plan: string[] }) => void;
+  plan_step_added: (payload: { index: number; step: string }) => void;
   step_executing: (payload: { step: string; command?: string }) => void;
+  step_output: (payload: { stream: "stdout" | "stderr"; data: string }) => void;
   step_result: (payload: {
     stdout: string;
     stderr: string;
@@ -78,7 +80,9 @@ class SocketClient {
     const events: (keyof SocketEvents)[] = [
       "status",
       "plan_generated",
+      "plan_step_added",
       "step_executing",
+      "step_output",
       "step_result",
       "error_detected",
       "re_planning",
@@ -93,6 +97,11 @@ class SocketClient {
       });
     });
 
+    // Coalesced events (SOCKETIO_BATCH_EVENTS): fan out each frame in order
+    this.socket.on("batch", (frame: { payload?: { events?: { type: string }[] } }) => {
+      frame?.payload?.events?.forEach(ev => this.emit(ev.type, ev));
+    });
+
     return this.socket;
   }
 